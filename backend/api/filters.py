@@ -1,6 +1,7 @@
 from django_filters.rest_framework import FilterSet, filters
 
 from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 
 
 class RecipeFilter(FilterSet):
@@ -9,7 +10,11 @@ class RecipeFilter(FilterSet):
         to_field_name='slug',
         queryset=Tag.objects.all(),
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags',)
+        fields = ('tags', 'search')
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
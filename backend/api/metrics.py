@@ -0,0 +1,130 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from time import perf_counter
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+from .middleware import dual_mode_middleware
+
+# With PROMETHEUS_MULTIPROC_DIR set every gunicorn worker writes its
+# samples to files there and /metrics sums them, see gunicorn.conf.py.
+REQUESTS = Counter(
+    'foodgram_requests_total', 'Запросы к API',
+    ['action', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'foodgram_request_duration_seconds', 'Время ответа',
+    ['action', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+QUERIES = Histogram(
+    'foodgram_db_queries_per_request', 'Запросов к базе на один ответ',
+    ['action'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total', 'Обращения к кэшу справочников',
+    ['cache', 'result'],
+)
+IMAGE_UPLOAD_BYTES = Histogram(
+    'foodgram_image_upload_bytes', 'Размер загруженных изображений',
+    buckets=(16384, 65536, 262144, 524288, 1048576, 2097152, 5242880),
+)
+METRICS_PATH = '/metrics'
+
+# Under ASGI the queries of a request run in other threads than the
+# middleware, so observers travel with the context instead of being
+# attached to the connections of the current thread.
+query_observers = ContextVar('query_observers', default=())
+
+
+def resolved_action(match, method):
+    view = getattr(match.func, 'cls', None)
+    if view is None:
+        return match.view_name
+    action = getattr(match.func, 'actions', {}).get(method.lower())
+    return f'{view.__name__}.{action or method.lower()}'
+
+
+def view_action(request):
+    match = request.resolver_match
+    if match is None:
+        return None
+    return resolved_action(match, request.method)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def observe_queries(execute, sql, params, many, context):
+    for observer in reversed(query_observers.get()):
+        execute = partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def install_query_observers(sender, connection, **kwargs):
+    # execute_wrapper() pops from the end, the observer goes first so a
+    # connection opened inside such a block keeps it.
+    if observe_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, observe_queries)
+
+
+@contextmanager
+def observing_queries(observer):
+    token = query_observers.set(query_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        query_observers.reset(token)
+
+
+@dual_mode_middleware
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == METRICS_PATH:
+            return self.get_response(request)
+        started = perf_counter()
+        with observing_queries(QueryCounter()) as queries:
+            response = self.get_response(request)
+        self.observe(request, response, started, queries)
+        return response
+
+    async def __acall__(self, request):
+        if request.path == METRICS_PATH:
+            return await self.get_response(request)
+        started = perf_counter()
+        with observing_queries(QueryCounter()) as queries:
+            response = await self.get_response(request)
+        self.observe(request, response, started, queries)
+        return response
+
+    def observe(self, request, response, started, queries):
+        action = view_action(request) or 'unresolved'
+        LATENCY.labels(action, request.method).observe(
+            perf_counter() - started)
+        REQUESTS.labels(action, request.method, response.status_code).inc()
+        QUERIES.labels(action).observe(queries.count)
+
+
+def metrics(request):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry),
+                        content_type=CONTENT_TYPE_LATEST)
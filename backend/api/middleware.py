@@ -0,0 +1,23 @@
+import asyncio
+from functools import wraps
+
+from django.utils.decorators import sync_and_async_middleware
+
+
+def dual_mode_middleware(middleware_class):
+    """Turn a middleware class with a sync __call__ and an async __acall__
+    into a factory Django runs natively under WSGI and ASGI.
+
+    The factory returns the instance when the next handler is sync and
+    its __acall__ coroutine function when it is async.
+    """
+
+    @sync_and_async_middleware
+    @wraps(middleware_class, updated=())
+    def factory(get_response):
+        middleware = middleware_class(get_response)
+        if asyncio.iscoroutinefunction(get_response):
+            return middleware.__acall__
+        return middleware
+
+    return factory
@@ -0,0 +1,81 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from foodgram_backend.routers import (reading_from_primary,
+                                      reading_from_replica)
+from recipes.versions import get_version
+
+from .metrics import CACHE_REQUESTS
+
+
+def reference_key(model, format, full_path):
+    version = get_version(model._meta.model_name)
+    return f'reference:{version}:{format}:{full_path}'
+
+
+def reference_etag(key):
+    return quote_etag(md5(key.encode()).hexdigest())
+
+
+class ReferenceDataMixin:
+    # Serialized payloads are kept in process memory and in the shared
+    # cache. Keys carry the model version, so a bump on save, delete or
+    # import makes every old entry and ETag unreachable.
+    local_cache = {}
+    local_cache_size = 4096
+
+    def list(self, request, *args, **kwargs):
+        return self.reference_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.reference_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def reference_response(self, handler, request, *args, **kwargs):
+        key = reference_key(self.queryset.model,
+                            request.accepted_renderer.format,
+                            request.get_full_path())
+        etag = reference_etag(key)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = self.local_cache.get(key)
+            CACHE_REQUESTS.labels(
+                'local', 'miss' if data is None else 'hit').inc()
+            if data is None:
+                data = cache.get(key)
+                CACHE_REQUESTS.labels(
+                    'shared', 'miss' if data is None else 'hit').inc()
+            if data is None:
+                with reading_from_primary():
+                    response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                data = response.data
+                cache.set(key, data, settings.REFERENCE_CACHE_TIMEOUT)
+            if len(self.local_cache) >= self.local_cache_size:
+                self.local_cache.clear()
+            self.local_cache[key] = data
+            response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class ReplicaReadMixin:
+    # Safe requests read from the replica, see ReplicaRouter.
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with reading_from_replica():
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,154 @@
+import json
+import logging
+import random
+import re
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework import fields, serializers
+
+from .metrics import observing_queries, view_action
+from .middleware import dual_mode_middleware
+from .serializers import ImageRenditionsField
+
+logger = logging.getLogger(__name__)
+
+current_profile = ContextVar('current_profile', default=None)
+PLACEHOLDERS = re.compile(r'%s(?:, %s)+')
+DUPLICATES_LIMIT = 5
+
+
+def fingerprint(sql):
+    # Queries reach the wrapper with %s placeholders, only IN lists of
+    # different length need folding.
+    return PLACEHOLDERS.sub('%s, ...', sql)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.sections = defaultdict(float)
+        self.active = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.fingerprints.most_common(DUPLICATES_LIMIT)
+            if count > 1
+        ]
+
+
+def timed(section, method):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        profile = current_profile.get()
+        # Nested serializers run inside the outer one and are not counted
+        # twice.
+        if profile is None or section in profile.active:
+            return method(*args, **kwargs)
+        profile.active.add(section)
+        started = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            profile.sections[section] += perf_counter() - started
+            profile.active.discard(section)
+
+    wrapper.profiled = True
+    return wrapper
+
+
+TIMED_METHODS = (
+    (serializers.Serializer, 'to_representation', 'serializer'),
+    (serializers.ListSerializer, 'to_representation', 'serializer'),
+    (fields.FileField, 'to_representation', 'images'),
+    (ImageRenditionsField, 'to_representation', 'images'),
+)
+
+
+def install_timers():
+    for cls, name, section in TIMED_METHODS:
+        method = cls.__dict__[name]
+        if not getattr(method, 'profiled', False):
+            setattr(cls, name, timed(section, method))
+
+
+@dual_mode_middleware
+class ProfilingMiddleware:
+    """Profiles a sample of requests, PROFILING_SAMPLE_RATE of 0 turns it
+    off.
+
+    Adds Server-Timing for SQL, serializers and image URLs and logs one
+    JSON line per profiled request. Streamed bodies are produced after the
+    middleware returns and are not covered.
+    """
+
+    def __init__(self, get_response):
+        if settings.PROFILING_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_timers()
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        started = perf_counter()
+        try:
+            with observing_queries(profile):
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        self.report(request, response, profile, perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return await self.get_response(request)
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        started = perf_counter()
+        try:
+            with observing_queries(profile):
+                response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        self.report(request, response, profile, perf_counter() - started)
+        return response
+
+    def report(self, request, response, profile, total):
+        response['Server-Timing'] = ', '.join(
+            [f'db;dur={profile.sql_time * 1000:.1f};'
+             f'desc="{profile.queries} queries"']
+            + [f'{section};dur={duration * 1000:.1f}'
+               for section, duration in sorted(profile.sections.items())]
+            + [f'total;dur={total * 1000:.1f}']
+        )
+        logger.info(json.dumps({
+            'action': view_action(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'queries': profile.queries,
+            'sql_ms': round(profile.sql_time * 1000, 1),
+            **{f'{section}_ms': round(duration * 1000, 1)
+               for section, duration in profile.sections.items()},
+            'duplicates': profile.duplicates(),
+        }, ensure_ascii=False))
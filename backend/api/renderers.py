@@ -0,0 +1,36 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Shopping list bodies are streamed by the view itself, only error
+        # payloads such as 401 end up here. They are sent as JSON, not
+        # under the media type of the list.
+        response = (renderer_context or {}).get('response')
+        if response is not None and response.exception:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data, JSONRenderer.media_type,
+                                     renderer_context)
+
+
+class TxtRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+
+
+SHOPPING_LIST_RENDERERS = (TxtRenderer, CSVRenderer, JSONRenderer,
+                           PDFRenderer)
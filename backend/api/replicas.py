@@ -0,0 +1,58 @@
+from hashlib import sha256
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import get_authorization_header
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram_backend.routers import REPLICA_DB_ALIAS, pinned_to_primary
+
+from .middleware import dual_mode_middleware
+
+
+def pin_key(request):
+    # Only token clients can write, the token identifies the client.
+    if REPLICA_DB_ALIAS not in settings.DATABASES:
+        return None
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != b'token':
+        return None
+    return f'replica_pin:{sha256(auth[1]).hexdigest()}'
+
+
+@dual_mode_middleware
+class ReplicaPinningMiddleware:
+    """After a successful write the client reads from the primary for
+    REPLICA_PIN_SECONDS, so a recipe, favorite or cart item it has just
+    added is not missing because the replica lags behind.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = pin_key(request)
+        if key is None:
+            return self.get_response(request)
+        if request.method in SAFE_METHODS:
+            with pinned_to_primary(cache.get(key, False)):
+                return self.get_response(request)
+        response = self.get_response(request)
+        if response.status_code < 400:
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        key = pin_key(request)
+        if key is None:
+            return await self.get_response(request)
+        if request.method in SAFE_METHODS:
+            pinned = await sync_to_async(cache.get)(key, False)
+            with pinned_to_primary(pinned):
+                return await self.get_response(request)
+        response = await self.get_response(request)
+        if response.status_code < 400:
+            await sync_to_async(cache.set)(
+                key, True, settings.REPLICA_PIN_SECONDS)
+        return response
@@ -1,14 +1,19 @@
-import base64
+import binascii
+import re
 
-from django.core.files.base import ContentFile
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers
+from rest_framework.validators import UniqueTogetherValidator
 
+from recipes.images import ImageTooLarge, decode_base64_image
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            RecipeIngredientRecipe, ShoppingCart, Tag)
+                            ShoppingCart, Tag)
 from users.models import Subscribe, User
 
+from .metrics import IMAGE_UPLOAD_BYTES
+
 
 MAX_VALUE = 32000
 MIN_VALUE = 1
@@ -26,8 +31,11 @@ class UserSerializer(UserCreateSerializer):
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        return (request.user.is_authenticated
-                and request.user.follower.filter(author=obj).exists())
+        if not request.user.is_authenticated:
+            return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return request.user.follower.filter(author=obj).exists()
 
 
 class TagListSerializer(serializers.ListSerializer):
@@ -47,16 +55,43 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'too_large': 'Image is larger than {max_size} bytes.',
+        'invalid_base64': 'Image is not valid base64.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            ext = re.sub(r'[^a-z0-9]', '', format.split('/')[-1].lower())
+            try:
+                data = decode_base64_image(imgstr, ext or 'img')
+            except ImageTooLarge as error:
+                self.fail('too_large', max_size=error.args[0])
+            except binascii.Error:
+                self.fail('invalid_base64')
+            IMAGE_UPLOAD_BYTES.observe(data.size)
 
         return super().to_internal_value(data)
 
 
+class ImageRenditionsField(serializers.ReadOnlyField):
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'image_renditions'
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        storage = Recipe._meta.get_field('image').storage
+        return {
+            name: {
+                extension: request.build_absolute_uri(storage.url(path))
+                for extension, path in formats.items()
+            }
+            for name, formats in value.items() if name != 'source'
+        }
+
+
 class IngredientGetSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='ingredient.id', read_only=True)
     name = serializers.CharField(source='ingredient.name', read_only=True)
@@ -117,36 +152,53 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
-        return (request.user.is_authenticated
-                and request.user.favorites.filter(recipe=obj).exists())
+        if not request.user.is_authenticated:
+            return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return request.user.favorites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
-        return (request.user.is_authenticated
-                and request.user.carts.filter(recipe=obj).exists())
+        if not request.user.is_authenticated:
+            return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return request.user.carts.filter(recipe=obj).exists()
 
     def validate(self, data):
         ingredients = data.get('ingredients')
         if len(ingredients) <= 0:
             raise serializers.ValidationError('Ingredients required!')
+        ingredient_ids = [
+            ingredient['ingredient']['id'] for ingredient in ingredients
+        ]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                {'ingredients': 'Ingredients must not repeat!'}
+            )
+        existing = Ingredient.objects.in_bulk(ingredient_ids)
+        missing = [str(pk) for pk in ingredient_ids if pk not in existing]
+        if missing:
+            raise serializers.ValidationError(
+                {'ingredients': f'Ingredients not found: {", ".join(missing)}'}
+            )
         tags = data.get('tags')
         if len(tags) <= 0:
             raise serializers.ValidationError('Tags required!')
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(author=request.user, **validated_data)
         recipe.tags.set(tags)
-        try:
-            CreateIngredients(ingredients, recipe)
-        except ValueError:
-            recipe.delete()
-            raise serializers.ValidationError('Bad request!')
+        CreateIngredients(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         name = validated_data.pop('name')
         instance.name = name
@@ -160,16 +212,22 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        instance.tags.clear()
         instance.tags.set(tags)
-        instance.ingredients.all().delete()
-        CreateIngredients(ingredients, instance)
+        UpdateIngredients(ingredients, instance)
         instance.save()
         return instance
 
+    def to_representation(self, instance):
+        prefetch_related_objects([instance], 'tags', Prefetch(
+            'ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ))
+        return super().to_representation(instance)
+
 
 class RecipeGetSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    images = ImageRenditionsField()
     tags = TagSerializer(many=True, read_only=True)
     ingredients = RecipeIngredientSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
@@ -178,27 +236,55 @@ class RecipeGetSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
-        return (request.user.is_authenticated
-                and request.user.favorites.filter(recipe=obj).exists())
+        if not request.user.is_authenticated:
+            return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return request.user.favorites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
-        return (request.user.is_authenticated
-                and request.user.carts.filter(recipe=obj).exists())
+        if not request.user.is_authenticated:
+            return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return request.user.carts.filter(recipe=obj).exists()
 
     class Meta:
         model = Recipe
         fields = ('id', 'author', 'tags',
                   'name', 'ingredients',
-                  'image', 'text', 'cooking_time',
+                  'image', 'images', 'text', 'cooking_time',
                   'is_favorited', 'is_in_shopping_cart',
                   )
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
+
+class RecipeMatchSerializer(RecipeGetSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeGetSerializer.Meta):
+        fields = RecipeGetSerializer.Meta.fields + (
+            'coverage', 'missing_ingredients',
+        )
+
 
 class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
         fields = '__all__'
+        validators = (
+            UniqueTogetherValidator(
+                queryset=Favorite.objects.all(),
+                fields=('user', 'recipe'),
+                message='Рецепт уже в избранном',
+            ),
+        )
 
 
 class UserSubscribeSerializer(serializers.ModelSerializer):
@@ -212,9 +298,16 @@ class UserSubscribeSerializer(serializers.ModelSerializer):
         return data
 
 
+class RecipeShortSerializer(serializers.ModelSerializer):
+    images = ImageRenditionsField()
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+
 class UserSubscribeViewSerializer(serializers.ModelSerializer):
-    recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes = RecipeShortSerializer(many=True, read_only=True)
 
     class Meta:
         model = User
@@ -223,46 +316,52 @@ class UserSubscribeViewSerializer(serializers.ModelSerializer):
                   'recipes',
                   'recipes_count')
 
-    def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if recipes_limit:
-            recipes = recipes[0:int(recipes_limit)]
-
-        return RecipeSerializer(recipes, many=True,
-                                context={'request': request}).data
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingCart
         fields = '__all__'
+        validators = (
+            UniqueTogetherValidator(
+                queryset=ShoppingCart.objects.all(),
+                fields=('user', 'recipe'),
+                message='Рецепт уже в списке покупок',
+            ),
+        )
 
 
 def CreateIngredients(ingredients, recipe):
-    current_recipe_ingredients = []
-    recipe_ingredients = []
-    for ingredient in ingredients:
-        current_ingredient = get_object_or_404(
-            Ingredient, id=ingredient.get('ingredient').get('id')
-        )
-        amount = ingredient.get('amount')
-        current_recipe_ingredient = RecipeIngredient(
-            ingredient=current_ingredient,
-            amount=amount
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient_id=ingredient.get('ingredient').get('id'),
+            amount=ingredient.get('amount')
         )
-        current_recipe_ingredients.append(
-            current_recipe_ingredient
-        )
-        recipe_ingredients.append(
-            RecipeIngredientRecipe(
-                recipe_ingredient=current_recipe_ingredient,
-                recipe=recipe
-            )
+        for ingredient in ingredients
+    )
+
+
+def UpdateIngredients(ingredients, recipe):
+    current = {
+        recipe_ingredient.ingredient_id: recipe_ingredient
+        for recipe_ingredient in recipe.ingredients.all()
+    }
+    new_ingredients = []
+    changed = []
+    for ingredient in ingredients:
+        recipe_ingredient = current.pop(
+            ingredient.get('ingredient').get('id'), None
         )
-    RecipeIngredient.objects.bulk_create(current_recipe_ingredients)
-    RecipeIngredientRecipe.objects.bulk_create(recipe_ingredients)
+        if recipe_ingredient is None:
+            new_ingredients.append(ingredient)
+        elif recipe_ingredient.amount != ingredient.get('amount'):
+            recipe_ingredient.amount = ingredient.get('amount')
+            changed.append(recipe_ingredient)
+    if current:
+        RecipeIngredient.objects.filter(
+            pk__in=[item.pk for item in current.values()]
+        ).delete()
+    if changed:
+        RecipeIngredient.objects.bulk_update(changed, ['amount'])
+    if new_ingredients:
+        CreateIngredients(new_ingredients, recipe)
@@ -0,0 +1,108 @@
+import csv
+import json
+from io import BytesIO
+
+from django.conf import settings
+from django.db.models import F, Sum
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+
+from recipes.models import RecipeIngredient
+
+
+CHUNK_SIZE = 500
+FIELDS = ('name', 'amount', 'measurement_unit')
+PDF_FONT = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_LINE_HEIGHT = 18
+PDF_MARGIN = 50
+
+
+def get_shopping_list(user):
+    return (
+        RecipeIngredient.objects
+        .filter(recipe__carts__user=user)
+        .values(
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        )
+        .annotate(amount=Sum('amount'))
+        .order_by('name', 'measurement_unit')
+    )
+
+
+def iter_shopping_list(user):
+    return get_shopping_list(user).iterator(chunk_size=CHUNK_SIZE)
+
+
+def export_txt(rows):
+    for row in rows:
+        yield (f'{row["name"]} - {row["amount"]}, '
+               f'{row["measurement_unit"]}\n')
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def export_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in FIELDS])
+
+
+def export_json(rows):
+    separator = '['
+    for row in rows:
+        yield separator + json.dumps(
+            {field: row[field] for field in FIELDS}, ensure_ascii=False
+        )
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+def get_pdf_font():
+    if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        try:
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT, settings.SHOPPING_CART_PDF_FONT)
+            )
+        except TTFError:
+            return 'Helvetica'
+    return PDF_FONT
+
+
+def export_pdf(rows):
+    # ReportLab only writes the document out on save(), so the page is
+    # built in memory. The aggregated list is bounded by the ingredient
+    # catalogue, rows are still read from the cursor one chunk at a time.
+    buffer = BytesIO()
+    font = get_pdf_font()
+    width, height = A4
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setTitle('Список покупок')
+    y = height - PDF_MARGIN
+    for row in rows:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            y = height - PDF_MARGIN
+        pdf.setFont(font, PDF_FONT_SIZE)
+        pdf.drawString(
+            PDF_MARGIN, y,
+            f'{row["name"]} - {row["amount"]}, {row["measurement_unit"]}'
+        )
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+    yield buffer.getvalue()
+
+
+EXPORTERS = {
+    'txt': export_txt,
+    'csv': export_csv,
+    'json': export_json,
+    'pdf': export_pdf,
+}
@@ -0,0 +1,62 @@
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+
+def test_user_save_keeps_concurrent_follower_count(
+        user, make_user, subscribe):
+    stale = User.objects.get(pk=user.pk)
+    subscribe(make_user(), user)
+    stale.first_name = 'Новое имя'
+    stale.save()
+    user.refresh_from_db()
+    assert user.followers_count == 1
+    assert user.first_name == 'Новое имя'
+
+
+def test_password_change_keeps_follower_count(
+        user, user_client, make_user, subscribe):
+    subscribe(make_user(), user)
+    response = user_client.post('/api/users/set_password/', {
+        'current_password': 'test-password',
+        'new_password': 'new-test-password',
+    })
+    assert response.status_code == 204
+    user.refresh_from_db()
+    assert user.followers_count == 1
+    assert user.check_password('new-test-password')
+
+
+def test_recipe_save_keeps_concurrent_counters(user, make_user, make_recipes):
+    recipe, = make_recipes(user, 1)
+    stale = Recipe.objects.get(pk=recipe.pk)
+    reader = make_user()
+    Favorite.objects.create(user=reader, recipe=recipe)
+    ShoppingCart.objects.create(user=reader, recipe=recipe)
+    stale.cooking_time = 20
+    stale.save()
+    recipe.refresh_from_db()
+    assert (recipe.favorites_count, recipe.in_carts_count) == (1, 1)
+    assert recipe.cooking_time == 20
+
+
+def test_recipe_update_keeps_counters(user, user_client, make_user,
+                                      make_recipes, tags, ingredients):
+    recipe, = make_recipes(user, 1)
+    Favorite.objects.create(user=make_user(), recipe=recipe)
+    response = user_client.patch(f'/api/recipes/{recipe.id}/', {
+        'name': 'Новое название',
+        'text': 'Текст',
+        'cooking_time': 5,
+        'tags': [tags[0].id],
+        'ingredients': [{'id': ingredients[0].id, 'amount': 10}],
+    }, format='json')
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 1
+
+
+def test_counters_are_saved_when_listed(user):
+    user.followers_count = 5
+    user.save(update_fields=['followers_count'])
+    user.refresh_from_db()
+    assert user.followers_count == 5
@@ -0,0 +1,17 @@
+import pytest
+
+from recipes.models import Favorite, ShoppingCart
+
+
+@pytest.mark.parametrize('action, model', (
+    ('favorite', Favorite),
+    ('shopping_cart', ShoppingCart),
+))
+def test_adding_twice_is_rejected(user, user_client, make_user, make_recipes,
+                                  action, model):
+    recipe, = make_recipes(make_user(), 1)
+    url = f'/api/recipes/{recipe.id}/{action}/'
+    assert user_client.post(url).status_code == 201
+    response = user_client.post(url)
+    assert response.status_code == 400
+    assert model.objects.filter(user=user, recipe=recipe).count() == 1
@@ -0,0 +1,53 @@
+import pytest
+
+from recipes.ingredient_index import ingredient_index
+from recipes.matching import recipe_matcher
+from recipes.models import Ingredient
+from recipes.search import has_full_text_search, recipe_search_index
+
+
+def test_ingredient_index_follows_version(
+        ingredients, django_capture_on_commit_callbacks):
+    assert ingredient_index.search('морковь') == []
+    with django_capture_on_commit_callbacks(execute=True):
+        carrot = Ingredient.objects.create(name='Морковь',
+                                           measurement_unit='г')
+    assert [entry['id'] for entry in ingredient_index.search('морковь')] == [
+        carrot.id]
+
+
+def test_search_index_follows_version(
+        user, make_recipes, django_capture_on_commit_callbacks):
+    if has_full_text_search():
+        pytest.skip('The index is only kept up to date without FTS')
+    recipe, = make_recipes(user, 1)
+    keys, postings = recipe_search_index.get_data()
+    assert len(keys) == len(postings)
+    assert recipe_search_index.search('борщ') == []
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.name = 'Борщ'
+        recipe.save()
+    assert recipe_search_index.search('борщ') == [recipe.id]
+
+
+def test_recipe_matcher_follows_changes(
+        user, ingredients, make_recipes, django_capture_on_commit_callbacks,
+        django_assert_num_queries):
+    ingredient_ids = [ingredient.id for ingredient in ingredients]
+    with django_capture_on_commit_callbacks(execute=True):
+        first, second = make_recipes(user, 2)
+    recipe_ids, sizes, postings = recipe_matcher.get_data()
+    assert len(recipe_ids) == len(sizes)
+    assert [recipe_id for recipe_id, _, _ in recipe_matcher.match(
+        ingredient_ids[:1])] == [second.id, first.id]
+    with django_capture_on_commit_callbacks(execute=True):
+        first.ingredients.exclude(ingredient=ingredients[0]).delete()
+        first.save()
+        second.delete()
+    # Only the changed recipes are read again.
+    with django_assert_num_queries(1):
+        matches = recipe_matcher.match(ingredient_ids[:1])
+    assert matches == [(first.id, 1.0, 0)]
+    new_recipe_ids, _, new_postings = recipe_matcher.get_data()
+    assert new_recipe_ids is recipe_ids
+    assert new_postings is not postings
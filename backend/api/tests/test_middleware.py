@@ -0,0 +1,38 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import AsyncClient, Client
+
+API_MIDDLEWARE = ('api.metrics.MetricsMiddleware',
+                  'api.profiling.ProfilingMiddleware',
+                  'api.replicas.ReplicaPinningMiddleware')
+
+
+@pytest.fixture
+def profiled(settings):
+    settings.PROFILING_SAMPLE_RATE = 1
+
+
+@pytest.mark.parametrize('handler', (WSGIHandler, ASGIHandler))
+def test_middleware_is_not_adapted(profiled, caplog, handler):
+    caplog.set_level(logging.DEBUG, logger='django.request')
+    handler()
+    assert [record.getMessage() for record in caplog.records
+            if record.getMessage().endswith(' adapted.')
+            and any(name in record.getMessage()
+                    for name in API_MIDDLEWARE)] == []
+
+
+@pytest.mark.django_db
+def test_middleware_serves_sync_and_async_requests(profiled, tags):
+    async def async_get(url):
+        return await AsyncClient().get(url)
+
+    responses = (Client().get('/api/tags/'),
+                 async_to_sync(async_get)('/api/tags/'))
+    for response in responses:
+        assert response.status_code == 200
+        assert 'total;dur=' in response['Server-Timing']
@@ -0,0 +1,40 @@
+import pytest
+from django.db import connection
+
+from recipes.management.commands.check_performance import (ENDPOINTS, call,
+                                                           scenario_context)
+from recipes.management.commands.check_query_plans import plan_problems
+from recipes.management.commands.check_replicas import replica_checks
+from recipes.seed import seed
+
+
+@pytest.mark.django_db
+def test_endpoints_stay_within_query_budgets():
+    seed(recipes=60, users=10)
+    ctx, clients = scenario_context()
+    over_budget = {}
+    # The first round only warms up in-process indexes and caches.
+    for ctx.i in range(2):
+        for endpoint in ENDPOINTS:
+            _, count, status = call(endpoint, ctx, clients)
+            if ctx.i and (
+                status != endpoint.status
+                or count > endpoint.max_queries(connection.vendor)
+            ):
+                over_budget[endpoint.name] = (status, count)
+    assert over_budget == {}
+
+
+@pytest.mark.django_db
+def test_hot_queries_use_indexes():
+    if connection.vendor != 'postgresql':
+        pytest.skip('Plans are only checked on PostgreSQL')
+    assert {label: found for label, found in plan_problems() if found} == {}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_go_to_replica_and_writes_are_visible():
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        pytest.skip('An in-memory database cannot be copied')
+    seed(recipes=30, users=10)
+    assert [name for name, ok in replica_checks() if not ok] == []
@@ -0,0 +1,58 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, ShoppingCart
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(queries)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/recipes/',
+    '/api/recipes/?pagination=cursor&limit=20',
+    '/api/recipes/?is_favorited=1',
+    '/api/recipes/?is_in_shopping_cart=1',
+])
+def test_recipe_list_queries_do_not_depend_on_page_size(
+        url, user, user_client, make_user, make_recipes):
+    def add_recipes(count):
+        for recipe in make_recipes(make_user(), count):
+            Favorite.objects.create(user=user, recipe=recipe)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    add_recipes(1)
+    small_page = count_queries(user_client, url)
+    add_recipes(5)
+    assert count_queries(user_client, url) == small_page
+
+
+def test_recipe_retrieve_queries_do_not_depend_on_contents(
+        user_client, user, make_recipes, tags, ingredients):
+    small, large = make_recipes(user, 2)
+    small.tags.set(tags[:1])
+    small.ingredients.exclude(ingredient=ingredients[0]).delete()
+    assert (count_queries(user_client, f'/api/recipes/{small.id}/')
+            == count_queries(user_client, f'/api/recipes/{large.id}/'))
+
+
+@pytest.mark.parametrize('url', [
+    '/api/users/subscriptions/',
+    '/api/users/subscriptions/?recipes_limit=2',
+])
+def test_subscriptions_queries_do_not_depend_on_page_size(
+        url, user, user_client, make_user, make_recipes, subscribe):
+    def add_authors(count):
+        for _ in range(count):
+            author = make_user()
+            make_recipes(author, 3)
+            subscribe(user, author)
+
+    add_authors(1)
+    small_page = count_queries(user_client, url)
+    add_authors(4)
+    assert count_queries(user_client, url) == small_page
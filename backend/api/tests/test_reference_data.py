@@ -0,0 +1,38 @@
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory
+from rest_framework.test import APIClient
+
+from api.async_views import tag_list
+from api.mixins import ReferenceDataMixin
+
+
+def tag_names(client):
+    return {tag['name'] for tag in client.get('/api/tags/').data}
+
+
+def test_tag_cache_is_invalidated_after_commit(
+        tags, django_capture_on_commit_callbacks):
+    client = APIClient()
+    tag = tags[0]
+    old_name = tag.name
+    assert old_name in tag_names(client)
+    with django_capture_on_commit_callbacks(execute=True):
+        tag.name = 'Новое имя'
+        tag.save()
+        # Until the commit the cached list must stay valid.
+        assert old_name in tag_names(client)
+    assert 'Новое имя' in tag_names(client)
+
+
+def test_async_list_authenticates_credentials(tags):
+    client = AsyncRequestFactory()
+
+    async def get(**headers):
+        return await tag_list(client.get('/api/tags/', **headers))
+
+    assert async_to_sync(get)().status_code == 200
+    assert ReferenceDataMixin.local_cache
+    # A cache hit must not skip authentication.
+    response = async_to_sync(get)(authorization='Token invalid')
+    assert response.status_code == 401
+    assert async_to_sync(get)().status_code == 200
@@ -0,0 +1,64 @@
+import random
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import pytest
+
+from recipes.models import Favorite, ShoppingCart, TrendingRecipe
+from recipes.trending import rebuild
+
+FAR_FUTURE = datetime(2040, 1, 1, tzinfo=timezone.utc)
+
+
+def trending_ids(client):
+    response = client.get('/api/recipes/trending/')
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def test_interactions_long_after_epoch(user, user_client, make_recipes,
+                                       settings):
+    settings.TRENDING_HALF_LIFE_HOURS = 24
+    recipe, = make_recipes(user, 1)
+    with mock.patch('django.utils.timezone.now', return_value=FAR_FUTURE):
+        response = user_client.post(f'/api/recipes/{recipe.id}/favorite/')
+    assert response.status_code == 201
+    assert trending_ids(user_client) == [recipe.id]
+
+
+def test_newer_interactions_rank_higher(user, user_client, make_user,
+                                        make_recipes):
+    old, new = make_recipes(user, 2)
+    now = datetime.now(timezone.utc)
+    for recipe, created in ((old, now - timedelta(days=30)), (new, now)):
+        with mock.patch('django.utils.timezone.now', return_value=created):
+            Favorite.objects.create(user=make_user(), recipe=recipe)
+    assert trending_ids(user_client) == [new.id, old.id]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_no_score_is_left_after_interactions_are_removed(
+        seed, user, user_client, make_user, make_recipes):
+    rng = random.Random(seed)
+    recipes = make_recipes(user, 3)
+    readers = [make_user() for _ in range(4)]
+    for _ in range(30):
+        model = rng.choice((Favorite, ShoppingCart))
+        link = {'user': rng.choice(readers), 'recipe': rng.choice(recipes)}
+        if model.objects.filter(**link).exists():
+            model.objects.get(**link).delete()
+        else:
+            model.objects.create(**link)
+    kept = set(Favorite.objects.values_list('recipe', flat=True)) | set(
+        ShoppingCart.objects.values_list('recipe', flat=True))
+    scores = dict(TrendingRecipe.objects.values_list('recipe', 'score'))
+    assert set(scores) == kept
+    rebuild()
+    rebuilt = dict(TrendingRecipe.objects.values_list('recipe', 'score'))
+    assert rebuilt.keys() == scores.keys()
+    for recipe_id, score in rebuilt.items():
+        assert scores[recipe_id] == pytest.approx(score, abs=1e-6)
+    for model in (Favorite, ShoppingCart):
+        model.objects.all().delete()
+    assert not TrendingRecipe.objects.exists()
+    assert trending_ids(user_client) == []
@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
-                    UserSubscriptionsViewSet, UserSubscriptionsGetViewSet)
+                    UserSubscriptionsViewSet, UserSubscriptionsGetViewSet,
+                    UserViewSet)
 
 app_name = 'api'
 
@@ -10,6 +12,7 @@ router = DefaultRouter()
 router.register('tags', TagViewSet, basename='tags')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
+router.register('users', UserViewSet, basename='users')
 
 urlpatterns = [
     path('users/<int:user_id>/subscribe/',
@@ -19,6 +22,13 @@ urlpatterns = [
     path('users/subscriptions/',
          UserSubscriptionsGetViewSet.as_view({'get': 'list'})),
     path('', include(router.urls)),
-    path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.SERVER_MODE == 'asgi':
+    from .async_views import ingredient_list, tag_list
+
+    urlpatterns = [
+        path('tags/', tag_list),
+        path('ingredients/', ingredient_list),
+    ] + urlpatterns
@@ -1,23 +1,39 @@
-from django.shortcuts import HttpResponse, get_object_or_404
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from api.filters import RecipeFilter
+from api.mixins import ReferenceDataMixin, ReplicaReadMixin
+from api.pagination import RecipeCursorPagination
 from api.permissions import IsAuthorOrReadOnly
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from api.renderers import SHOPPING_LIST_RENDERERS
+from recipes.ingredient_index import ingredient_index
+from recipes.matching import recipe_matcher
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 from users.models import Subscribe, User
 
 from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeGetSerializer, RecipeSerializer,
-                          ShoppingCartSerializer, TagSerializer,
-                          UserSubscribeSerializer, UserSubscribeViewSerializer)
+                          RecipeGetSerializer, RecipeMatchSerializer,
+                          RecipeSerializer, ShoppingCartSerializer,
+                          TagSerializer, UserSubscribeSerializer,
+                          UserSubscribeViewSerializer)
+from .shopping_list import EXPORTERS, iter_shopping_list
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(DjoserUserViewSet):
+    def get_queryset(self):
+        return super().get_queryset().with_is_subscribed(self.request.user)
+
+
+class TagViewSet(ReplicaReadMixin, ReferenceDataMixin,
+                 viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
@@ -25,21 +41,28 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     http_method_names = ['get', ]
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, ReferenceDataMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny, )
     pagination_class = None
     http_method_names = ['get', ]
 
-    def get_queryset(self):
-        if (self.request.query_params.get('name')):
-            return Ingredient.objects.filter(
-                name__startswith=self.request.query_params.get('name'))
-        return Ingredient.objects.all()
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        return self.reference_response(self.search, request)
+
+    def search(self, request):
+        serializer = self.get_serializer(
+            ingredient_index.search(request.query_params.get('name')),
+            many=True
+        )
+        return Response(serializer.data)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
@@ -47,20 +70,71 @@ class RecipeViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
 
     def get_queryset(self):
+        recipes = Recipe.objects.with_user_flags(self.request.user)
+        if self.action in ('list', 'retrieve', 'trending', 'cook'):
+            recipes = recipes.with_related()
         if (self.request.query_params.get('is_favorited') == '1'):
-            return Recipe.objects.filter(infavorite__user=self.request.user)
+            return recipes.filter(infavorite__user=self.request.user)
         if (self.request.query_params.get('is_in_shopping_cart') == '1'):
-            return Recipe.objects.filter(carts__user=self.request.user)
+            return recipes.filter(carts__user=self.request.user)
         if (self.request.query_params.get('author')):
-            return Recipe.objects.filter(
+            return recipes.filter(
                 author=self.request.query_params.get('author'))
-        return Recipe.objects.all()
+        return recipes
+
+    @property
+    def paginator(self):
+        if (not hasattr(self, '_paginator')
+                and self.action == 'list'
+                and self.request.query_params.get('pagination') == 'cursor'):
+            self._paginator = RecipeCursorPagination()
+        return super().paginator
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'trending'):
             return RecipeGetSerializer
+        if self.action == 'cook':
+            return RecipeMatchSerializer
         return RecipeSerializer
 
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        recipes = self.filter_queryset(self.get_queryset()).filter(
+            trending__isnull=False
+        ).order_by('-trending__score', '-trending__recipe_id')
+        page = self.paginate_queryset(recipes)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def cook(self, request):
+        ingredients = [
+            value for param in request.query_params.getlist('ingredients')
+            for value in param.split(',') if value
+        ]
+        if not ingredients or not all(
+                value.isdigit() for value in ingredients):
+            raise ValidationError(
+                {'ingredients': 'Pass ingredient ids, e.g. ?ingredients=1,2'}
+            )
+        max_missing = request.query_params.get('max_missing')
+        page = self.paginate_queryset(recipe_matcher.match(
+            map(int, ingredients),
+            int(max_missing) if max_missing and max_missing.isdigit()
+            else None
+        ))
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page])
+        matched = []
+        for recipe_id, coverage, missing in page:
+            if recipe_id in recipes:
+                recipe = recipes[recipe_id]
+                recipe.coverage = coverage
+                recipe.missing_ingredients = missing
+                matched.append(recipe)
+        serializer = self.get_serializer(matched, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -85,33 +159,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         detail=False,
         methods=['get'],
-        permission_classes=[IsAuthenticated, ]
+        permission_classes=[IsAuthenticated, ],
+        renderer_classes=SHOPPING_LIST_RENDERERS
     )
     def download_shopping_cart(self, request):
-        ingredients_list = []
-        recipes = Recipe.objects.filter(carts__user=request.user)
-        for recipe in recipes:
-            ingredients = RecipeIngredient.objects.filter(
-                recipeIngredientRecipe__recipe=recipe
-            )
-            for ingredient in ingredients:
-                ingredients_list.append(
-                    [
-                        ingredient.ingredient.name,
-                        ingredient.amount,
-                        ingredient.ingredient.measurement_unit
-                    ]
-                )
-        shopping_cart = []
-        for ingredient in ingredients_list:
-            name = ingredient[0]
-            unit = ingredient[2]
-            amount = ingredient[1]
-            shopping_cart.append(f'\n{name} - {amount}, {unit}')
-        response = HttpResponse(shopping_cart, content_type='text/plain')
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            EXPORTERS[renderer.format](iter_shopping_list(request.user)),
+            content_type=content_type
+        )
         response[
             'Content-Disposition'
-        ] = 'attachment; filename="shopping_cart.txt"'
+        ] = f'attachment; filename="shopping_cart.{renderer.format}"'
         return response
 
     @action(
@@ -137,12 +199,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class UserSubscriptionsGetViewSet(viewsets.ModelViewSet):
+class UserSubscriptionsGetViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = UserSubscribeViewSerializer
     permission_classes = [IsAuthenticated, ]
 
     def get_queryset(self):
-        return User.objects.filter(following__user=self.request.user)
+        recipes = Recipe.objects.short()
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes.latest_per_author(int(recipes_limit))
+        return User.objects.filter(
+            following__user=self.request.user
+        ).prefetch_related(Prefetch('recipes', queryset=recipes))
 
 
 class UserSubscriptionsViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,86 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import Subscribe, User
+
+IMAGE = 'recipes/images/test.png'
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(settings, tmp_path):
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }}
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.RECIPE_IMAGE_WORKERS = 0
+    # Local memory caches with the same location share their data.
+    cache.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user():
+        number = User.objects.count()
+        return User.objects.create_user(
+            username=f'user{number}', email=f'user{number}@example.com',
+            password='test-password', first_name='Имя',
+            last_name='Фамилия',
+        )
+    return make_user
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}')
+    return client
+
+
+@pytest.fixture
+def tags(db):
+    return [Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}',
+                               color=f'#00000{number}')
+            for number in range(3)]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [Ingredient.objects.create(name=f'Продукт {number}',
+                                      measurement_unit='г')
+            for number in range(5)]
+
+
+@pytest.fixture
+def make_recipes(tags, ingredients):
+    def make_recipes(author, count):
+        recipes = []
+        for _ in range(count):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {Recipe.objects.count()}',
+                text='Текст', image=IMAGE, cooking_time=10,
+            )
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=100)
+                for ingredient in ingredients
+            )
+            recipes.append(recipe)
+        return recipes
+    return make_recipes
+
+
+@pytest.fixture
+def subscribe():
+    def subscribe(user, author):
+        return Subscribe.objects.create(user=user, author=author)
+    return subscribe
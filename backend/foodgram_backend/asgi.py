@@ -8,9 +8,67 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
+from itertools import islice
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.handlers.asgi import ASGIHandler as BaseASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
+STREAM_BATCH = 64
+
+
+def read_parts(iterator):
+    return list(islice(iterator, STREAM_BATCH))
+
+
+class ASGIHandler(BaseASGIHandler):
+    """Django 3.2 runs the sync part of every request on one shared thread
+    and iterates streamed bodies on the event loop. As in later Django
+    versions, each request gets its own thread, and so its own database
+    connection, and streamed bodies are read there in batches.
+    """
+
+    async def __call__(self, scope, receive, send):
+        async with ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (header.encode('ascii') if isinstance(header, str) else header,
+             value.encode('latin1') if isinstance(value, str) else value)
+            for header, value in response.items()
+        ] + [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        ]
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        iterator = iter(response)
+        while True:
+            parts = await sync_to_async(read_parts)(iterator)
+            if not parts:
+                break
+            for part in parts:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close)()
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return ASGIHandler()
+
+
 application = get_asgi_application()
@@ -0,0 +1,19 @@
+class CounterFieldsMixin:
+    """Counter fields are changed only by F() updates. An ordinary save()
+    of an instance loaded earlier would write back their stale values, so
+    they are saved only when listed in update_fields.
+    """
+
+    counter_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if update_fields is None and not force_insert and not (
+                self._state.adding):
+            update_fields = {
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            } - self.get_deferred_fields()
+        super().save(force_insert=force_insert, force_update=force_update,
+                     using=using, update_fields=update_fields)
@@ -0,0 +1,23 @@
+from django.contrib.postgres import operations
+from django.db.migrations import AddIndex
+
+
+class AddIndexConcurrently(operations.AddIndexConcurrently):
+    # CREATE INDEX CONCURRENTLY on PostgreSQL, a plain CREATE INDEX on
+    # databases that do not support it.
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_forwards(
+            self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_backwards(
+            self, app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,165 @@
+import queue
+import threading
+import time
+
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+Database = base.Database
+pools = {}
+pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """A fixed number of connections shared by the threads of a process.
+
+    Checkout blocks for up to timeout seconds when all of them are taken.
+    """
+
+    def __init__(self, conn_params, size, timeout, health_checks):
+        self.conn_params = conn_params
+        self.timeout = timeout
+        self.health_checks = health_checks
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = queue.LifoQueue()
+
+    def acquire(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise Database.OperationalError(
+                f'No free connection in the pool after {self.timeout} s')
+        try:
+            while True:
+                try:
+                    connection = self.idle.get_nowait()
+                except queue.Empty:
+                    return Database.connect(**self.conn_params)
+                if self.is_usable(connection):
+                    return connection
+                connection.close()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, connection):
+        try:
+            status = connection.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                connection.close()
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            if not connection.closed:
+                self.idle.put(connection)
+        finally:
+            self.slots.release()
+
+    def is_usable(self, connection):
+        if connection.closed:
+            return False
+        if not self.health_checks:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+    def clear(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def clear_pools(database_name):
+    with pools_lock:
+        for (_, name), pool in pools.items():
+            if name == database_name:
+                pool.clear()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    # Idle pooled connections would keep the database from being dropped
+    # or used as a template.
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        self.connection.close()
+        clear_pools(self.connection.settings_dict['NAME'])
+        super()._clone_test_db(suffix, verbosity, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        clear_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """The stock PostgreSQL backend with two extra settings.
+
+    CONN_POOL_SIZE above 0 keeps a per-process pool: a connection goes back
+    to it at the end of every request instead of being closed. Unlike
+    CONN_MAX_AGE this also works under ASGI, where every request runs in a
+    new thread. CONN_HEALTH_CHECKS checks a reused connection before the
+    first query of a request, as Django 4.1 does.
+    """
+
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.health_check_pending = False
+
+    def get_pool(self, conn_params):
+        size = self.settings_dict.get('CONN_POOL_SIZE', 0)
+        if not size or self.alias == NO_DB_ALIAS:
+            return None
+        key = (self.alias, conn_params.get('database'))
+        with pools_lock:
+            if key not in pools:
+                pools[key] = ConnectionPool(
+                    conn_params, size,
+                    self.settings_dict.get('CONN_POOL_TIMEOUT', 30),
+                    self.settings_dict.get('CONN_HEALTH_CHECKS', False),
+                )
+            return pools[key]
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        if self.pool is None:
+            return super().get_new_connection(conn_params)
+        connection = self.pool.acquire()
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level',
+                                           connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        base.psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def connect(self):
+        super().connect()
+        if self.pool is not None:
+            # Back to the pool as soon as the request is over.
+            self.close_at = time.monotonic()
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            self.pool.release(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        if self.connection is not None:
+            self.health_check_pending = self.settings_dict.get(
+                'CONN_HEALTH_CHECKS', False)
+
+    def _cursor(self, name=None):
+        if self.health_check_pending:
+            self.health_check_pending = False
+            if self.connection is not None and not self.is_usable():
+                self.close()
+        return super()._cursor(name)
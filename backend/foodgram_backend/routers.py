@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+
+replica_reads = ContextVar('replica_reads', default=False)
+primary_pinned = ContextVar('primary_pinned', default=False)
+
+
+@contextmanager
+def reading_from(replica):
+    token = replica_reads.set(replica)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def reading_from_replica():
+    return reading_from(True)
+
+
+def reading_from_primary():
+    # For data stored under a version: a lagging replica would leave the
+    # old rows cached under the new version.
+    return reading_from(False)
+
+
+@contextmanager
+def pinned_to_primary(pinned=True):
+    # Overrides reading_from_replica() for clients that have just written,
+    # see api.replicas.ReplicaPinningMiddleware.
+    token = primary_pinned.set(pinned)
+    try:
+        yield
+    finally:
+        primary_pinned.reset(token)
+
+
+class ReplicaRouter:
+    """Sends reads made inside reading_from_replica() to the replica when
+    one is configured and the request is not pinned to the primary,
+    everything else goes to the primary.
+
+    Tokens are always read from the primary, clients use them right after
+    logging in.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (replica_reads.get() and not primary_pinned.get()
+                and REPLICA_DB_ALIAS in settings.DATABASES
+                and model._meta.label != 'authtoken.Token'):
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -32,6 +33,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.profiling.ProfilingMiddleware',
+    'api.replicas.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,19 +66,68 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
 
+# wsgi or asgi, picks the gunicorn worker class and the async views.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+
 # Database
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # django.db.backends.postgresql with pooling and health checks.
+        'ENGINE': 'foodgram_backend.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Ignored under ASGI without DB_POOL_SIZE, see below.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_POOL_SIZE': int(os.getenv('DB_POOL_SIZE', 0)),
+        'CONN_POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_HEALTH_CHECKS', 'false').lower() == 'true'
+        ),
+        # pgbouncer in transaction mode does not keep cursors between
+        # transactions.
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.getenv('DB_PGBOUNCER', 'false').lower() == 'true'
+        ),
     }
 }
 
+if SERVER_MODE == 'asgi' and not DATABASES['default']['CONN_POOL_SIZE']:
+    # Every ASGI request runs in a new thread, a persistent connection
+    # would stay open after the thread is gone.
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram_backend.routers.ReplicaRouter']
+
+# How long a client reads from the primary after a write, should cover
+# the replication lag.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', '/var/tmp/foodgram_cache'),
+    }
+}
+
+REFERENCE_CACHE_TIMEOUT = int(os.getenv('REFERENCE_CACHE_TIMEOUT', 86400))
+
 
 # Password validation
 
@@ -115,6 +168,42 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/var/www/foodgram/media/'
 
+DEFAULT_FILE_STORAGE = 'recipes.storage.ContentAddressedStorage'
+
+MEDIA_GARBAGE_GRACE_MINUTES = int(os.getenv('MEDIA_GARBAGE_GRACE_MINUTES', 60))
+
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', 5242880))
+
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 72))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+
+INGREDIENT_TRIGRAM_SEARCH = (
+    os.getenv('INGREDIENT_TRIGRAM_SEARCH', 'false').lower() == 'true'
+)
+
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'russian')
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.profiling': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 # Default primary key field type
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
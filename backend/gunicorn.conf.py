@@ -0,0 +1,26 @@
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+bind = '0:8000'
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+if os.environ.get('SERVER_MODE') == 'asgi':
+    wsgi_app = 'foodgram_backend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram_backend.wsgi:application'
+    threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+
+def on_starting(server):
+    # Samples of workers from a previous run must not leak into /metrics.
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
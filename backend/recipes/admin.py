@@ -3,14 +3,14 @@ from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     RecipeIngredientRecipe, ShoppingCart, Tag)
+                     ShoppingCart, Tag)
 
 
 class IngredientResource(resources.ModelResource):
 
     class Meta:
         model = Ingredient
-        import_id_fields = ('name',)
+        import_id_fields = ('name', 'measurement_unit')
         skip_unchanged = True
 
 
@@ -26,18 +26,13 @@ class RecipeIngredienttAdmin(admin.ModelAdmin):
     exclude = ('pk',)
 
 
-@admin.register(RecipeIngredientRecipe)
-class RecipeIngredienttRecipeAdmin(admin.ModelAdmin):
-    exclude = ('pk',)
-
-
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     exclude = ('pk',)
 
 
 class RecipeIngredientInLine(admin.TabularInline):
-    model = RecipeIngredientRecipe
+    model = RecipeIngredient
     extra = 0
     min_num = 1
 
@@ -0,0 +1,133 @@
+import base64
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.db import close_old_connections, transaction
+from PIL import Image
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Multiple of 4, so every chunk decodes on its own.
+DECODE_CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+RENDITIONS = {
+    'thumbnail': (160, 160),
+    'list': (480, 480),
+    'detail': (1200, 1200),
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True,
+             'progressive': True},
+}
+RENDITIONS_DIR = 'recipes/renditions/'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def decode_base64_image(encoded, extension):
+    max_size = settings.RECIPE_IMAGE_MAX_SIZE
+    if len(encoded) // 4 * 3 > max_size + 2:
+        raise ImageTooLarge(max_size)
+    digest = hashlib.sha256()
+    buffer = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    size = 0
+    for start in range(0, len(encoded), DECODE_CHUNK_SIZE):
+        chunk = base64.b64decode(
+            encoded[start:start + DECODE_CHUNK_SIZE], validate=True
+        )
+        size += len(chunk)
+        if size > max_size:
+            raise ImageTooLarge(max_size)
+        digest.update(chunk)
+        buffer.write(chunk)
+    buffer.seek(0)
+    return File(buffer, name=f'{digest.hexdigest()[:32]}.{extension}')
+
+
+def render(image, size, options):
+    rendition = image.copy()
+    rendition.thumbnail(size, Image.LANCZOS)
+    if options['format'] == 'JPEG' and rendition.mode != 'RGB':
+        background = Image.new('RGB', rendition.size, 'white')
+        if rendition.mode in ('RGBA', 'LA', 'P'):
+            rendition = rendition.convert('RGBA')
+            background.paste(rendition, mask=rendition.split()[-1])
+        else:
+            background.paste(rendition.convert('RGB'))
+        rendition = background
+    output = BytesIO()
+    rendition.save(output, **options)
+    return output.getvalue()
+
+
+def build_renditions(recipe):
+    storage = recipe.image.storage
+    with recipe.image.open('rb') as source:
+        image = Image.open(source)
+        image.load()
+    renditions = {'source': recipe.image.name}
+    for name, size in RENDITIONS.items():
+        renditions[name] = {}
+        for extension, options in FORMATS.items():
+            renditions[name][extension] = storage.save(
+                f'{RENDITIONS_DIR}{name}.{extension}',
+                ContentFile(render(image, size, options))
+            )
+    return renditions
+
+
+def process_recipe_image(recipe_id):
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+        if recipe is None or not recipe.image:
+            return
+        renditions = build_renditions(recipe)
+        # Skip the write if the image was replaced while rendering.
+        Recipe.objects.filter(
+            pk=recipe_id, image=renditions['source']
+        ).update(image_renditions=renditions)
+    except Exception:
+        logger.exception('Не удалось обработать изображение рецепта %s',
+                         recipe_id)
+
+
+def process_in_worker(recipe_id):
+    close_old_connections()
+    try:
+        process_recipe_image(recipe_id)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+    return _executor
+
+
+def schedule_renditions(recipe_id):
+    if settings.RECIPE_IMAGE_WORKERS <= 0:
+        transaction.on_commit(lambda: process_recipe_image(recipe_id))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(process_in_worker, recipe_id)
+    )
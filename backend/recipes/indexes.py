@@ -0,0 +1,36 @@
+import threading
+
+from foodgram_backend.routers import reading_from_primary
+
+from .versions import get_version
+
+
+class VersionedIndex:
+    """In-memory data that every process builds for itself and rebuilds
+    when its version in the cache changes. With a shared cache backend a
+    change made in one worker reaches all of them.
+
+    build() returns the whole new data, and it replaces the old data in
+    one assignment. A reader gets either the old data or the new data,
+    never a mix of both.
+    """
+
+    version_name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = None
+
+    def build(self):
+        raise NotImplementedError
+
+    def get_data(self):
+        version = get_version(self.version_name)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    with reading_from_primary():
+                        self._data = self.build()
+                    self._version = version
+        return self._data
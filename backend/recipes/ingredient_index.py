@@ -0,0 +1,66 @@
+from bisect import bisect_left
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+
+from .indexes import VersionedIndex
+from .models import Ingredient
+
+
+class IngredientIndex(VersionedIndex):
+    version_name = Ingredient._meta.model_name
+
+    def build(self):
+        # The same name comes with several units, so ties go by id.
+        rows = sorted(
+            ((name.casefold(), pk), {
+                'id': pk, 'name': name, 'measurement_unit': unit,
+            })
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit')
+        )
+        return ([key for (key, _), _ in rows],
+                [entry for _, entry in rows])
+
+    def search(self, query, limit=None):
+        limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+        query = query.strip().casefold()
+        keys, entries = self.get_data()
+        results = []
+        position = bisect_left(keys, query)
+        while (position < len(keys) and len(results) < limit
+               and keys[position].startswith(query)):
+            results.append(entries[position])
+            position += 1
+        if len(results) < limit:
+            results.extend(
+                entry for key, entry in zip(keys, entries)
+                if query in key and not key.startswith(query)
+            )
+            results = results[:limit]
+        if len(results) < limit and settings.INGREDIENT_TRIGRAM_SEARCH:
+            results.extend(self.fuzzy_search(
+                query, limit - len(results),
+                exclude=[entry['id'] for entry in results]
+            ))
+        return results
+
+    def fuzzy_search(self, query, limit, exclude=()):
+        if connection.vendor != 'postgresql':
+            return []
+        return list(trigram_matches(query, exclude)[:limit])
+
+
+def trigram_matches(query, exclude=()):
+    return (
+        Ingredient.objects
+        .filter(name__trigram_similar=query)
+        .exclude(id__in=exclude)
+        .annotate(similarity=TrigramSimilarity('name', query))
+        .order_by('-similarity', 'name')
+        .values('id', 'name', 'measurement_unit')
+    )
+
+
+ingredient_index = IngredientIndex()
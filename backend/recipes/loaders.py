@@ -0,0 +1,305 @@
+import csv
+import json
+from io import StringIO
+from itertools import islice
+from pathlib import Path
+
+from django.db import connection, transaction
+
+from users.models import User
+
+from .images import schedule_renditions
+from .management.commands.rebuild_counters import rebuild_counters
+from .matching import MATCH_INDEX
+from .models import (MAX_VALUE, MIN_VALUE, Ingredient, Recipe,
+                     RecipeIngredient, Tag)
+from .search import SEARCH_INDEX, update_search_vectors
+from .versions import bump_version
+
+CHUNK_SIZE = 5000
+READ_SIZE = 64 * 1024
+STAGING_TABLE = 'ingredient_staging'
+
+
+def read_csv(file):
+    # Some rows of data/ingredients.csv start with an id, name and unit
+    # are always the last two columns.
+    for row in csv.reader(file):
+        if len(row) >= 2 and row[-2:] != ['name', 'measurement_unit']:
+            yield {'name': row[-2], 'measurement_unit': row[-1]}
+
+
+def read_json(file):
+    # Walks a top-level array one element at a time, so the whole file is
+    # never parsed at once.
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('JSON file must contain an array')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except ValueError:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'jsonl': read_jsonl,
+}
+
+
+def read_items(path, format=None):
+    format = format or Path(path).suffix.lstrip('.').lower()
+    if format not in READERS:
+        raise ValueError(f'Unknown format: {format}')
+    with open(path, encoding='utf-8', newline='') as file:
+        yield from READERS[format](file)
+
+
+def chunked(items, size=CHUNK_SIZE):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def max_length(model, field):
+    return model._meta.get_field(field).max_length
+
+
+def text(value, limit=None):
+    """Stripped non-empty string that fits the limit, None otherwise."""
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if not value or limit and len(value) > limit:
+        return None
+    return value
+
+
+def small_integer(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+    value = int(value)
+    if not MIN_VALUE <= value <= MAX_VALUE:
+        raise ValueError(value)
+    return value
+
+
+def ingredient_key(item):
+    """(name, measurement_unit) of an item, None if either is missing or
+    too long."""
+    if not isinstance(item, dict):
+        return None
+    key = (text(item.get('name'), max_length(Ingredient, 'name')),
+           text(item.get('measurement_unit'),
+                max_length(Ingredient, 'measurement_unit')))
+    return key if all(key) else None
+
+
+class IngredientLoader:
+    """Upserts ingredients, deduplicated on (name, measurement_unit).
+
+    PostgreSQL gets COPY into a staging table and one INSERT ... ON
+    CONFLICT per chunk, other databases bulk_create. Items without a name
+    or a unit, or with values too long for the columns, are skipped.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.skipped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        bump_version(Ingredient._meta.model_name)
+
+    def load(self, items):
+        rows = []
+        for item in items:
+            key = ingredient_key(item)
+            if key is None:
+                self.skipped += 1
+            elif key not in self.seen:
+                self.seen.add(key)
+                rows.append(key)
+        if not rows:
+            return 0
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                return self.copy(rows)
+            # bulk_create returns skipped rows too, so count instead.
+            before = Ingredient.objects.count()
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in rows),
+                ignore_conflicts=True,
+            )
+            return Ingredient.objects.count() - before
+
+    def copy(self, rows):
+        buffer = StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            # Created in the chunk's transaction, so it is there on the
+            # same server connection behind a transaction pooler. Without
+            # the id column staged rows take no values from its sequence.
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {STAGING_TABLE} ('
+                f'name varchar({max_length(Ingredient, "name")}), '
+                'measurement_unit varchar('
+                f'{max_length(Ingredient, "measurement_unit")})'
+                ') ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)', buffer)
+            cursor.execute(
+                'INSERT INTO recipes_ingredient (name, measurement_unit) '
+                f'SELECT name, measurement_unit FROM {STAGING_TABLE} '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            created = cursor.rowcount
+            # Inside an outer transaction the commit comes later.
+            cursor.execute(f'DROP TABLE {STAGING_TABLE}')
+            return created
+
+
+class RecipeLoader:
+    """Creates recipes from dicts with author (email), name, text, image,
+    cooking_time, tags (slugs) and ingredients ({name, measurement_unit,
+    amount}). Malformed items, values out of the model limits, recipes
+    that refer to unknown authors, tags or ingredients and recipes whose
+    name is taken or repeated are skipped. Image renditions are scheduled
+    for the loaded recipes.
+    """
+
+    def __init__(self):
+        self.ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit')
+        }
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.loaded = []
+        self.skipped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        rebuild_derived_data(Recipe.objects.filter(id__in=self.loaded))
+        for recipe_id in self.loaded:
+            schedule_renditions(recipe_id)
+
+    def resolve(self, item, authors):
+        try:
+            ingredients = {
+                self.ingredients[ingredient_key(ingredient)]:
+                    small_integer(ingredient['amount'])
+                for ingredient in item['ingredients']
+            }
+            name = text(item['name'], max_length(Recipe, 'name'))
+            description = text(item['text'])
+            image = text(item['image'], max_length(Recipe, 'image'))
+            if not (ingredients and name and description and image):
+                return None
+            return (
+                Recipe(author_id=authors[item['author']],
+                       name=name, text=description, image=image,
+                       cooking_time=small_integer(item['cooking_time'])),
+                [self.tags[slug] for slug in item.get('tags', ())],
+                ingredients,
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def load(self, items):
+        valid = [item for item in items if isinstance(item, dict)
+                 and isinstance(item.get('author'), str)
+                 and isinstance(item.get('name'), str)]
+        self.skipped += len(items) - len(valid)
+        authors = User.objects.in_bulk(
+            {item['author'] for item in valid}, field_name='email')
+        authors = {email: user.id for email, user in authors.items()}
+        resolved = {}
+        names = set()
+        for item in valid:
+            recipe = self.resolve(item, authors)
+            # Recipe names are unique across all authors, the first item
+            # with a name wins.
+            if recipe is None or recipe[0].name in names:
+                self.skipped += 1
+                continue
+            names.add(recipe[0].name)
+            resolved[recipe[0].author_id, recipe[0].name] = recipe
+        taken = set(Recipe.objects.filter(
+            name__in=names).values_list('name', flat=True))
+        for key in [key for key in resolved if key[1] in taken]:
+            del resolved[key]
+            self.skipped += 1
+        if not resolved:
+            return 0
+        with transaction.atomic():
+            Recipe.objects.bulk_create(
+                recipe for recipe, _, _ in resolved.values())
+            ids = {
+                (author_id, name): pk
+                for pk, author_id, name in Recipe.objects.filter(
+                    name__in=[name for _, name in resolved]
+                ).values_list('id', 'author_id', 'name')
+            }
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe_id=ids[key], ingredient_id=pk,
+                                 amount=amount)
+                for key, (_, _, ingredients) in resolved.items()
+                for pk, amount in ingredients.items()
+            )
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=ids[key], tag_id=tag_id)
+                for key, (_, tags, _) in resolved.items()
+                for tag_id in set(tags)
+            )
+        self.loaded.extend(ids.values())
+        return len(resolved)
+
+
+LOADERS = {
+    'ingredients': IngredientLoader,
+    'recipes': RecipeLoader,
+}
+
+
+def rebuild_derived_data(recipes, users=None):
+    # bulk_create sends no signals, so counters, search vectors and the
+    # in-process indexes are brought up to date here. By default only
+    # the authors of the recipes have counters to fix.
+    if users is None:
+        users = User.objects.filter(pk__in=recipes.values('author'))
+    rebuild_counters(recipes, users)
+    update_search_vectors(recipes)
+    for name in (Ingredient._meta.model_name, Tag._meta.model_name,
+                 SEARCH_INDEX, MATCH_INDEX):
+        bump_version(name)
@@ -0,0 +1,57 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from recipes.models import Recipe
+from recipes.search import (has_full_text_search, recipe_search_index,
+                            search_recipes)
+
+
+def search_icontains(query):
+    return list(Recipe.objects.filter(
+        Q(name__icontains=query)
+        | Q(text__icontains=query)
+        | Q(ingredients__ingredient__name__icontains=query)
+    ).distinct().values_list('id', flat=True))
+
+
+def search_index(query):
+    return recipe_search_index.search(query)
+
+
+def search_database(query):
+    return list(search_recipes(Recipe.objects.all(), query)
+                .values_list('id', flat=True))
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость полнотекстового поиска рецептов и icontains'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='+')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз повторить каждый запрос',
+        )
+
+    def handle(self, *args, **options):
+        methods = [('icontains', search_icontains),
+                   ('inverted index', search_index)]
+        if has_full_text_search():
+            methods.append(('tsvector', search_database))
+        # The first call builds the index, it is not what is measured.
+        recipe_search_index.search('')
+        for query in options['queries']:
+            self.stdout.write(f'«{query}»')
+            for label, method in methods:
+                started = perf_counter()
+                for _ in range(options['repeat']):
+                    found = method(query)
+                elapsed = (perf_counter() - started) / options['repeat']
+                self.stdout.write(
+                    f'  {label}: {elapsed * 1000:.2f} мс, '
+                    f'найдено {len(found)}'
+                )
@@ -0,0 +1,148 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from io import StringIO
+
+import requests
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+
+STARTUP_TIMEOUT = 30
+SLOW_UPLOAD = ('POST /api/recipes/ HTTP/1.1\r\n'
+               'Host: localhost\r\n'
+               'Authorization: Token {token}\r\n'
+               'Content-Type: application/json\r\n'
+               'Content-Length: 10485760\r\n\r\n')
+SLOW_UPLOAD_INTERVAL = 0.5
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('gunicorn завершился при запуске')
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise CommandError(f'Сервер не ответил за {STARTUP_TIMEOUT} с')
+
+
+def slow_upload(port, token, stop):
+    # A client on a bad connection: the body of a large image upload
+    # arrives a byte at a time and is never finished.
+    while not stop.is_set():
+        try:
+            with socket.create_connection(('127.0.0.1', port)) as sock:
+                sock.sendall(SLOW_UPLOAD.format(token=token).encode())
+                while not stop.wait(SLOW_UPLOAD_INTERVAL):
+                    sock.sendall(b' ')
+        except OSError:
+            stop.wait(SLOW_UPLOAD_INTERVAL)
+
+
+class Command(BaseCommand):
+    help = ('Запускает gunicorn с WSGI и ASGI воркерами и сравнивает, как '
+            'растёт пропускная способность с числом одновременных клиентов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help='Журнал запросов для replay_requests')
+        parser.add_argument(
+            '--modes', nargs='+', choices=('wsgi', 'asgi'),
+            default=['wsgi', 'asgi'],
+        )
+        parser.add_argument(
+            '--concurrency', nargs='+', type=int, default=[1, 4, 16, 64],
+        )
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Потоков на WSGI воркер',
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Сколько медленных загрузок держать открытыми во время '
+                 'замера',
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument(
+            '--report',
+            default='server-benchmark.json',
+            help='Куда записать отчёт в JSON, «-» — в stdout',
+        )
+
+    def handle(self, *args, **options):
+        report = {'workers': options['workers'],
+                  'threads': options['threads'],
+                  'slow_clients': options['slow_clients'], 'modes': {}}
+        for mode in options['modes']:
+            report['modes'][mode] = self.benchmark(mode, options)
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['report'] == '-':
+            self.stdout.write(content)
+        else:
+            with open(options['report'], 'w', encoding='utf-8') as file:
+                file.write(content + '\n')
+
+    def benchmark(self, mode, options):
+        port = free_port()
+        url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, SERVER_MODE=mode,
+                   GUNICORN_WORKERS=str(options['workers']),
+                   GUNICORN_THREADS=str(options['threads']))
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+             '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        results = {}
+        stop = threading.Event()
+        try:
+            wait_for(f'{url}/api/tags/', process)
+            call_command('replay_requests', options['log'], url=url,
+                         seed=True, repeat=1, warmup=0, report=os.devnull,
+                         stdout=StringIO())
+            if options['slow_clients']:
+                token = Token.objects.get_or_create(
+                    user=User.objects.order_by('id').first())[0].key
+            for _ in range(options['slow_clients']):
+                threading.Thread(target=slow_upload,
+                                 args=(port, token, stop),
+                                 daemon=True).start()
+            for concurrency in options['concurrency']:
+                with tempfile.NamedTemporaryFile(suffix='.json') as file:
+                    call_command(
+                        'replay_requests', options['log'], url=url,
+                        concurrency=concurrency, repeat=options['repeat'],
+                        warmup=0, label=mode, timeout=10,
+                        report=file.name, stdout=StringIO(),
+                    )
+                    total = json.load(file)['total']
+                results[concurrency] = total
+                self.stdout.write(
+                    f'{mode}, {concurrency} клиентов: '
+                    f'{total["throughput_rps"]} rps, '
+                    f'p50 {total["p50_ms"]} мс, p95 {total["p95_ms"]} мс, '
+                    f'ошибок {total["errors"]}'
+                )
+        finally:
+            stop.set()
+            process.terminate()
+            process.wait()
+        return results
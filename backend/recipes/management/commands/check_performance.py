@@ -0,0 +1,296 @@
+import json
+import math
+from time import perf_counter
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.seed import PASSWORD, scratch_database, seed
+from users.models import User
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAA'
+    'ACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNo'
+    'AAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+NEW_PASSWORD = 'seed-password-changed'
+
+
+class Endpoint:
+    """One request of the scenario with its query and p95 budgets.
+
+    url and data may be callables taking the scenario context, store is
+    called with the context and the response. vendor_queries overrides
+    the query budget for a database vendor.
+    """
+
+    def __init__(self, name, method, url, queries, p95_ms, data=None,
+                 client='user', status=200, store=None, vendor_queries=None):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.queries = queries
+        self.vendor_queries = vendor_queries or {}
+        self.p95_ms = p95_ms
+        self.data = data
+        self.client = client
+        self.status = status
+        self.store = store
+
+    def resolve(self, value, ctx):
+        return value(ctx) if callable(value) else value
+
+    def max_queries(self, vendor):
+        return self.vendor_queries.get(vendor, self.queries)
+
+
+def recipe_payload(ctx):
+    return {
+        'ingredients': [{'id': pk, 'amount': 10 + ctx.i}
+                        for pk in ctx.ingredient_ids[:5]],
+        'tags': ctx.tag_ids[:2],
+        'image': IMAGE,
+        'name': f'Рецепт замера {ctx.i}',
+        'text': 'Текст рецепта',
+        'cooking_time': 15,
+    }
+
+
+def store_recipe(ctx, response):
+    ctx.own_recipe_id = response.data['id']
+
+
+def store_token(ctx, response):
+    ctx.login_token = response.data['auth_token']
+
+
+def set_password_data(ctx):
+    current, new = ((PASSWORD, NEW_PASSWORD) if ctx.i % 2 == 0
+                    else (NEW_PASSWORD, PASSWORD))
+    return {'current_password': current, 'new_password': new}
+
+
+ENDPOINTS = (
+    Endpoint('tags list', 'get', '/api/tags/', 1, 50),
+    Endpoint('tags detail', 'get', lambda c: f'/api/tags/{c.tag_ids[0]}/',
+             1, 50),
+    Endpoint('ingredients list', 'get', '/api/ingredients/', 1, 300),
+    Endpoint('ingredients search', 'get', '/api/ingredients/?name=мук',
+             1, 50),
+    Endpoint('ingredients detail', 'get',
+             lambda c: f'/api/ingredients/{c.ingredient_ids[0]}/', 1, 50),
+    Endpoint('recipes list anonymous', 'get', '/api/recipes/', 4, 150,
+             client='anon'),
+    Endpoint('recipes list', 'get', '/api/recipes/', 5, 150),
+    Endpoint('recipes list cursor', 'get',
+             '/api/recipes/?pagination=cursor', 4, 150),
+    Endpoint('recipes favorited', 'get', '/api/recipes/?is_favorited=1',
+             5, 150),
+    Endpoint('recipes in cart', 'get', '/api/recipes/?is_in_shopping_cart=1',
+             5, 150),
+    Endpoint('recipes by author', 'get',
+             lambda c: f'/api/recipes/?author={c.author_id}', 5, 150),
+    Endpoint('recipes by tag', 'get', '/api/recipes/?tags=breakfast', 6, 150),
+    # Without full-text search every recipe write of the scenario makes
+    # the next search rebuild the in-process index.
+    Endpoint('recipes search', 'get', '/api/recipes/?search=мука', 5, 300,
+             vendor_queries={'sqlite': 7}),
+    Endpoint('recipes trending', 'get', '/api/recipes/trending/', 5, 150),
+    Endpoint('recipes cook', 'get',
+             lambda c: '/api/recipes/cook/?ingredients=' + ','.join(
+                 map(str, c.ingredient_ids[:20])), 5, 150),
+    Endpoint('recipes detail', 'get',
+             lambda c: f'/api/recipes/{c.recipe_id}/', 4, 100),
+    Endpoint('recipe create', 'post', '/api/recipes/', 18, 300,
+             data=recipe_payload, status=201, store=store_recipe),
+    Endpoint('recipe update', 'patch',
+             lambda c: f'/api/recipes/{c.own_recipe_id}/', 14, 300,
+             data=lambda c: {key: value
+                             for key, value in recipe_payload(c).items()
+                             if key != 'image'}),
+    Endpoint('favorite add', 'post',
+             lambda c: f'/api/recipes/{c.recipe_id}/favorite/', 9, 100,
+             status=201),
+    Endpoint('favorite remove', 'delete',
+             lambda c: f'/api/recipes/{c.recipe_id}/favorite/', 9, 100,
+             status=204),
+    Endpoint('cart add', 'post',
+             lambda c: f'/api/recipes/{c.recipe_id}/shopping_cart/', 9, 100,
+             status=201),
+    Endpoint('shopping list txt', 'get',
+             '/api/recipes/download_shopping_cart/', 2, 150),
+    Endpoint('shopping list pdf', 'get',
+             '/api/recipes/download_shopping_cart/?format=pdf', 2, 500),
+    Endpoint('cart remove', 'delete',
+             lambda c: f'/api/recipes/{c.recipe_id}/shopping_cart/', 9, 100,
+             status=204),
+    Endpoint('recipe delete', 'delete',
+             lambda c: f'/api/recipes/{c.own_recipe_id}/', 11, 300,
+             status=204),
+    Endpoint('users list', 'get', '/api/users/', 3, 100),
+    Endpoint('users detail', 'get', lambda c: f'/api/users/{c.author_id}/',
+             2, 100),
+    Endpoint('users me', 'get', '/api/users/me/', 2, 100),
+    Endpoint('user create', 'post', '/api/users/', 3, 500, client='anon',
+             data=lambda c: {
+                 'email': f'perf{c.i}@example.com',
+                 'username': f'perf{c.i}',
+                 'first_name': 'Имя',
+                 'last_name': 'Фамилия',
+                 'password': 'Perf-password-42',
+             }, status=201),
+    Endpoint('set password', 'post', '/api/users/set_password/', 2, 1000,
+             data=set_password_data, status=204),
+    Endpoint('subscriptions', 'get',
+             '/api/users/subscriptions/?recipes_limit=3', 4, 200),
+    Endpoint('subscribe', 'post',
+             lambda c: f'/api/users/{c.stranger_id}/subscribe/', 6, 100,
+             status=201),
+    Endpoint('unsubscribe', 'delete',
+             lambda c: f'/api/users/{c.stranger_id}/subscribe/', 4, 100,
+             status=204),
+    Endpoint('token login', 'post', '/api/auth/token/login/', 4, 1000,
+             client='anon', store=store_token,
+             data=lambda c: {'email': c.login_email, 'password': PASSWORD}),
+    Endpoint('token logout', 'post', '/api/auth/token/logout/', 2, 100,
+             client='login', status=204),
+)
+
+
+def scenario_context():
+    """Context and clients for the scenario on a database filled by seed."""
+    user, login_user, stranger = User.objects.order_by('id')[:3]
+    user.follower.filter(author=stranger).delete()
+    ctx = SimpleNamespace(
+        i=0,
+        tag_ids=list(Tag.objects.values_list('id', flat=True)),
+        ingredient_ids=list(Ingredient.objects.values_list('id', flat=True)),
+        recipe_id=Recipe.objects.exclude(author=user).filter(
+            infavorite__isnull=True).values_list('id', flat=True)[0],
+        author_id=user.follower.values_list('author', flat=True)[0],
+        stranger_id=stranger.id,
+        login_email=login_user.email,
+        login_token=None,
+        own_recipe_id=None,
+    )
+    clients = {'anon': APIClient(), 'user': APIClient()}
+    clients['user'].credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}')
+    return ctx, clients
+
+
+TRANSACTION_CONTROL = ('BEGIN', 'SAVEPOINT ', 'RELEASE SAVEPOINT ')
+
+
+def count_queries(captured):
+    # SQLite logs the BEGIN that other backends send implicitly, and
+    # inside a test transaction every atomic block adds savepoints.
+    return sum(not query['sql'].startswith(TRANSACTION_CONTROL)
+               for query in captured)
+
+
+def call(endpoint, ctx, clients):
+    if endpoint.client == 'login':
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {ctx.login_token}')
+    else:
+        client = clients[endpoint.client]
+    url = endpoint.resolve(endpoint.url, ctx)
+    data = endpoint.resolve(endpoint.data, ctx)
+    with CaptureQueriesContext(connection) as captured:
+        started = perf_counter()
+        response = getattr(client, endpoint.method)(url, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = perf_counter() - started
+    if endpoint.store and response.status_code == endpoint.status:
+        endpoint.store(ctx, response)
+    return elapsed, count_queries(captured), response.status_code
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = ('Засевает тестовую базу, обходит все эндпоинты API и проверяет '
+            'бюджеты запросов к базе и p95 времени ответа')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--report',
+            default='perf-report.json',
+            help='Куда записать отчёт в JSON, «-» — в stdout',
+        )
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            report = self.run_scenario(options)
+        self.write_report(report, options['report'])
+        failed = [name for name, result in report['endpoints'].items()
+                  if not result['ok']]
+        if failed:
+            raise CommandError(f'Бюджет превышен: {", ".join(failed)}')
+
+    def run_scenario(self, options):
+        dataset = seed(recipes=options['recipes'], users=options['users'])
+        ctx, clients = scenario_context()
+        timings = {endpoint.name: [] for endpoint in ENDPOINTS}
+        queries = {endpoint.name: 0 for endpoint in ENDPOINTS}
+        statuses = {endpoint.name: set() for endpoint in ENDPOINTS}
+        # The first round only warms up in-process indexes and caches.
+        for ctx.i in range(options['repeat'] + 1):
+            for endpoint in ENDPOINTS:
+                elapsed, count, status = call(endpoint, ctx, clients)
+                statuses[endpoint.name].add(status)
+                if ctx.i:
+                    timings[endpoint.name].append(elapsed)
+                    queries[endpoint.name] = max(queries[endpoint.name],
+                                                 count)
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            max_queries = endpoint.max_queries(connection.vendor)
+            p95 = percentile(timings[endpoint.name], 0.95) * 1000
+            endpoints[endpoint.name] = {
+                'method': endpoint.method.upper(),
+                'statuses': sorted(statuses[endpoint.name]),
+                'queries': queries[endpoint.name],
+                'max_queries': max_queries,
+                'p50_ms': round(percentile(timings[endpoint.name], 0.5)
+                                * 1000, 2),
+                'p95_ms': round(p95, 2),
+                'max_p95_ms': endpoint.p95_ms,
+                'ok': (statuses[endpoint.name] == {endpoint.status}
+                       and queries[endpoint.name] <= max_queries
+                       and p95 <= endpoint.p95_ms),
+            }
+        return {
+            'database': connection.vendor,
+            'dataset': dataset,
+            'repeat': options['repeat'],
+            'endpoints': endpoints,
+        }
+
+    def write_report(self, report, path):
+        content = json.dumps(report, ensure_ascii=False, indent=2,
+                             sort_keys=True)
+        if path == '-':
+            self.stdout.write(content)
+        else:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(content + '\n')
+        for name, result in report['endpoints'].items():
+            line = (f'{name}: {result["queries"]}/{result["max_queries"]} '
+                    f'запросов, p95 {result["p95_ms"]}/'
+                    f'{result["max_p95_ms"]} мс')
+            self.stdout.write(line if result['ok']
+                              else self.style.ERROR(line))
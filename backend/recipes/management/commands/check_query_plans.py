@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.ingredient_index import trigram_matches
+from recipes.models import (Favorite, Recipe, RecipeIngredient,
+                            ShoppingCart)
+from recipes.search import search_recipes
+from users.models import Subscribe, User
+
+
+# Shapes of the queries behind api/views.py, api/filters.py and the
+# serializers. Literal values do not matter for the plan. Queries listed
+# in ORDERED must also get their order from an index rather than a Sort.
+HOT_QUERIES = (
+    ('лента рецептов', lambda: Recipe.objects.order_by('-created', '-id')[:6]),
+    ('рецепты автора',
+     lambda: Recipe.objects.filter(author_id=1).order_by('-created')),
+    ('последние рецепты авторов',
+     lambda: Recipe.objects.latest_per_author(3)),
+    ('фильтр по тегу', lambda: Recipe.objects.filter(tags__slug='breakfast')),
+    ('избранное пользователя',
+     lambda: Favorite.objects.filter(user_id=1).order_by('-created')),
+    ('рецепты в избранном',
+     lambda: Recipe.objects.filter(infavorite__user_id=1)),
+    ('список покупок пользователя',
+     lambda: ShoppingCart.objects.filter(user_id=1).order_by('-created')),
+    ('ингредиенты списка покупок',
+     lambda: RecipeIngredient.objects.filter(recipe__carts__user_id=1)),
+    ('подписки пользователя', lambda: Subscribe.objects.filter(user_id=1)),
+    ('авторы в подписках',
+     lambda: User.objects.filter(following__user_id=1)),
+    ('нечёткий поиск ингредиента',
+     lambda: trigram_matches('мук', exclude=[1])[:10]),
+    ('полнотекстовый поиск',
+     lambda: search_recipes(Recipe.objects.all(), 'суп')),
+    ('популярные рецепты', lambda: Recipe.objects.filter(
+        trending__isnull=False
+    ).order_by('-trending__score', '-trending__recipe_id')[:6]),
+)
+# Queries that need an extension, skipped where it is not installed.
+EXTENSIONS = {'нечёткий поиск ингредиента': 'pg_trgm'}
+ORDERED = {'лента рецептов', 'рецепты автора', 'избранное пользователя',
+           'список покупок пользователя', 'популярные рецепты'}
+
+
+def nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from nodes(child)
+
+
+def problems(label, plan):
+    for node in nodes(plan):
+        if node['Node Type'] == 'Seq Scan':
+            yield f'Seq Scan по {node["Relation Name"]}'
+        elif node['Node Type'] == 'Sort' and label in ORDERED:
+            yield f'Sort по {", ".join(node["Sort Key"])}'
+
+
+def plan_problems():
+    """Yield each hot query with the problems found in its plan, None
+    if the query needs an extension that is not installed."""
+    # With sequential scans and sorts disabled the planner still picks
+    # them when no index can serve the query, so any left is a miss.
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('SET LOCAL enable_sort = off')
+        cursor.execute('SELECT extname FROM pg_extension')
+        installed = {name for name, in cursor.fetchall()}
+        for label, build in HOT_QUERIES:
+            extension = EXTENSIONS.get(label)
+            if extension and extension not in installed:
+                yield label, None
+                continue
+            sql, params = build().query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0][0]['Plan']
+            yield label, sorted(set(problems(label, plan)))
+
+
+class Command(BaseCommand):
+    help = ('Проверяет через EXPLAIN, что горячие запросы не читают '
+            'таблицы целиком')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Проверка планов работает только с PostgreSQL')
+        failed = 0
+        for label, found in plan_problems():
+            if found is None:
+                self.stdout.write(self.style.WARNING(
+                    f'{label}: пропущен, нет расширения {EXTENSIONS[label]}'))
+            elif found:
+                failed += 1
+                self.stdout.write(self.style.ERROR(
+                    f'{label}: {"; ".join(found)}'))
+            else:
+                self.stdout.write(f'{label}: OK')
+        if failed:
+            raise CommandError(f'Запросов без индекса: {failed}')
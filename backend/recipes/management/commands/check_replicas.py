@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram_backend.routers import REPLICA_DB_ALIAS
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.seed import scratch_database, seed
+from users.models import User
+
+from .check_performance import recipe_payload
+
+REPLICA_SUFFIX = 'replica'
+
+
+def drop_connection(alias):
+    connections[alias].close()
+    del connections[alias]
+
+
+@contextmanager
+def stale_replica():
+    """Point the replica alias at a copy of the scratch database made now.
+    Later writes reach only the primary, as with a replica that lags."""
+    creation = connection.creation
+    creation.clone_test_db(REPLICA_SUFFIX, verbosity=0, autoclobber=True)
+    configured = settings.DATABASES.get(REPLICA_DB_ALIAS)
+    if configured is not None:
+        drop_connection(REPLICA_DB_ALIAS)
+    settings.DATABASES[REPLICA_DB_ALIAS] = (
+        creation.get_test_db_clone_settings(REPLICA_SUFFIX))
+    try:
+        yield
+    finally:
+        drop_connection(REPLICA_DB_ALIAS)
+        if configured is None:
+            del settings.DATABASES[REPLICA_DB_ALIAS]
+        else:
+            settings.DATABASES[REPLICA_DB_ALIAS] = configured
+        creation.destroy_test_db(verbosity=0, suffix=REPLICA_SUFFIX)
+
+
+def ids(response):
+    return {item['id'] for item in response.data['results']}
+
+
+def replica_checks():
+    """Run the read-your-writes scenario against a lagging replica and
+    return (description, passed) pairs. Needs a seeded database that
+    the backend can clone."""
+    user, other, author = User.objects.order_by('id')[:3]
+    # Lists are paginated, start them empty so new entries are on the
+    # first page.
+    user.follower.all().delete()
+    other.favorites.all().delete()
+    other.carts.all().delete()
+    recipe_id = Recipe.objects.exclude(author=other).values_list(
+        'id', flat=True)[0]
+    ctx = SimpleNamespace(
+        i=0,
+        tag_ids=list(Tag.objects.values_list('id', flat=True)),
+        ingredient_ids=list(Ingredient.objects.values_list(
+            'id', flat=True)),
+    )
+    with stale_replica():
+        # Tokens appear only on the primary and still authenticate.
+        clients = {'anon': APIClient()}
+        for name, client_user in (('user', user), ('other', other)):
+            clients[name] = APIClient()
+            clients[name].credentials(HTTP_AUTHORIZATION=(
+                f'Token {Token.objects.create(user=client_user)}'))
+        with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as qs:
+            clients['anon'].get('/api/recipes/')
+        results = [('Список рецептов читается с реплики', len(qs) > 0)]
+
+        response = clients['user'].post(
+            '/api/recipes/', recipe_payload(ctx), format='json')
+        new_id = response.data.get('id')
+        url = f'/api/recipes/{new_id}/'
+        results += [
+            ('Рецепт создан', response.status_code == 201),
+            ('Другие не видят рецепт, пока реплика отстаёт',
+             clients['other'].get(url).status_code == 404),
+            ('Автор сразу видит свой рецепт',
+             clients['user'].get(url).status_code == 200),
+        ]
+        cache.clear()
+        results.append((
+            'После закрепления автор снова читает с реплики',
+            clients['user'].get(url).status_code == 404,
+        ))
+
+        for action, flag in (('favorite', 'is_favorited'),
+                             ('shopping_cart', 'is_in_shopping_cart')):
+            response = clients['other'].post(
+                f'/api/recipes/{recipe_id}/{action}/')
+            listed = clients['other'].get(
+                '/api/recipes/', {flag: 1, 'limit': 100})
+            results.append((
+                f'{action}: добавленный рецепт сразу в списке',
+                response.status_code == 201
+                and recipe_id in ids(listed),
+            ))
+
+        response = clients['user'].post(
+            f'/api/users/{author.id}/subscribe/')
+        listed = clients['user'].get('/api/users/subscriptions/')
+        results.append((
+            'Новая подписка сразу в списке подписок',
+            response.status_code == 201 and author.id in ids(listed),
+        ))
+
+        tag = Tag.objects.create(
+            name='Новый тег', slug='new-tag', color='#000000')
+        results.append((
+            'Справочник тегов собирается с основной базы',
+            tag.id in {item['id'] for item in
+                       clients['anon'].get('/api/tags/').data},
+        ))
+    return results
+
+
+class Command(BaseCommand):
+    help = ('Проверяет на двух тестовых базах, что чтения идут с реплики, '
+            'а клиент после записи видит свои изменения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=300)
+        parser.add_argument('--users', type=int, default=20)
+
+    def handle(self, *args, **options):
+        directory = None
+        test_settings = connection.settings_dict['TEST']
+        old_test_name = test_settings['NAME']
+        if connection.vendor == 'sqlite':
+            # An in-memory database cannot be copied.
+            directory = tempfile.mkdtemp()
+            test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+        try:
+            with scratch_database():
+                seed(recipes=options['recipes'], users=options['users'])
+                results = replica_checks()
+        finally:
+            test_settings['NAME'] = old_test_name
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+        failed = [name for name, ok in results if not ok]
+        for name, ok in results:
+            self.stdout.write(f'{name}: ' + (
+                self.style.SUCCESS('ok') if ok else self.style.ERROR('нет')))
+        if failed:
+            raise CommandError(f'Не прошли проверки: {len(failed)}')
@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.images import RENDITIONS_DIR
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы изображений, на которые не ссылается ни один рецепт'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать файлы, которые будут удалены',
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=settings.MEDIA_GARBAGE_GRACE_MINUTES,
+            help='Не трогать файлы моложе указанного числа минут',
+        )
+
+    def referenced_files(self):
+        referenced = set()
+        for image, renditions in Recipe.objects.values_list(
+                'image', 'image_renditions').iterator():
+            referenced.add(image)
+            for name, formats in renditions.items():
+                if name != 'source':
+                    referenced.update(formats.values())
+        return referenced
+
+    def handle(self, *args, **options):
+        image_field = Recipe._meta.get_field('image')
+        storage = image_field.storage
+        # Uploads are written before their recipe is committed.
+        threshold = timezone.now() - timedelta(minutes=options['grace'])
+        referenced = self.referenced_files()
+        removed = 0
+        for directory in (image_field.upload_to, RENDITIONS_DIR):
+            if not storage.exists(directory):
+                continue
+            for filename in storage.listdir(directory)[1]:
+                name = directory + filename
+                if (name in referenced
+                        or storage.get_modified_time(name) > threshold):
+                    continue
+                if not options['dry_run']:
+                    storage.delete(name)
+                removed += 1
+                self.stdout.write(name)
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(f'{action} файлов без ссылок: {removed}')
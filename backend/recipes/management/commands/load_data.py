@@ -0,0 +1,53 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.loaders import (CHUNK_SIZE, LOADERS, READERS, chunked,
+                             read_items)
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты или рецепты из CSV, JSON или JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='Формат файла, по умолчанию берётся из расширения',
+        )
+        parser.add_argument(
+            '--model',
+            choices=sorted(LOADERS),
+            default='ingredients',
+            help='Что загружать',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Сколько строк записывать за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        items = read_items(options['path'], options['format'])
+        read = created = 0
+        started = perf_counter()
+        try:
+            with LOADERS[options['model']]() as loader:
+                for chunk in chunked(items, options['chunk_size']):
+                    read += len(chunk)
+                    created += loader.load(chunk)
+                    elapsed = perf_counter() - started
+                    self.stdout.write(
+                        f'Прочитано {read}, добавлено {created}, '
+                        f'пропущено {loader.skipped}, '
+                        f'{read / elapsed:.0f} строк/с'
+                    )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {perf_counter() - started:.1f} с: '
+            f'прочитано {read}, добавлено {created}, '
+            f'пропущено {loader.skipped}'
+        ))
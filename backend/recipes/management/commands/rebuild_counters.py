@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe, User
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscribe, 'author'),
+)
+
+
+def actual_count(related, field):
+    return Coalesce(Subquery(
+        related.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def rebuild_counters(recipes, users):
+    """Set the counters of the given recipes and users to actual counts."""
+    rows = {Recipe: recipes, User: users}
+    for model, counter, related, field in COUNTERS:
+        rows[model].update(**{counter: actual_count(related, field)})
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного, покупок, рецептов и подписчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти расхождения, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        drifted_total = 0
+        for model, counter, related, field in COUNTERS:
+            label = f'{model.__name__}.{counter}'
+            drifted = model.objects.annotate(
+                actual=actual_count(related, field)
+            ).exclude(**{counter: F('actual')}).count()
+            drifted_total += drifted
+            if options['check']:
+                self.stdout.write(f'{label}: расхождений {drifted}')
+                continue
+            with transaction.atomic():
+                model.objects.update(
+                    **{counter: actual_count(related, field)}
+                )
+            self.stdout.write(f'{label}: исправлено {drifted}')
+        if options['check'] and drifted_total:
+            raise CommandError(f'Найдено расхождений: {drifted_total}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг популярных рецептов'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(f'Рецептов в рейтинге: {count}')
@@ -0,0 +1,335 @@
+import json
+import random
+import re
+import threading
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from time import perf_counter
+from urllib.parse import urlsplit
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.urls import Resolver404, resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.metrics import QueryCounter, observing_queries, resolved_action
+from recipes.management.commands.check_performance import percentile
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.seed import scratch_database, seed
+from users.models import User
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+class Replay:
+    """One request of the log with placeholders already filled in. It is
+    sent only after the request in after has been, and sets done once it
+    has been sent itself."""
+
+    def __init__(self, label, method, path, user, body, after=None):
+        self.label = label
+        self.method = method
+        self.path = path
+        self.user = user
+        self.body = body
+        self.after = after
+        self.done = threading.Event()
+
+
+class InProcessTarget:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.local = threading.local()
+
+    def start(self):
+        # Every worker thread has its own connection and counter.
+        self.local.client = APIClient(raise_request_exception=False)
+        self.local.queries = QueryCounter()
+        self.local.stack = ExitStack()
+        self.local.stack.enter_context(observing_queries(self.local.queries))
+
+    def stop(self):
+        self.local.stack.close()
+        connections.close_all()
+
+    def send(self, replay):
+        extra = {}
+        if replay.user is not None:
+            extra['HTTP_AUTHORIZATION'] = f'Token {self.tokens[replay.user]}'
+        before = self.local.queries.count
+        response = self.local.client.generic(
+            replay.method, replay.path,
+            json.dumps(replay.body) if replay.body is not None else '',
+            content_type='application/json', **extra,
+        )
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code, self.local.queries.count - before
+
+
+class HttpTarget:
+    def __init__(self, tokens, url, timeout):
+        self.tokens = tokens
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def start(self):
+        self.local.session = requests.Session()
+
+    def stop(self):
+        self.local.session.close()
+
+    def send(self, replay):
+        headers = {}
+        if replay.user is not None:
+            headers['Authorization'] = f'Token {self.tokens[replay.user]}'
+        try:
+            response = self.local.session.request(
+                replay.method, self.url + replay.path, json=replay.body,
+                headers=headers, timeout=self.timeout,
+            )
+        except requests.RequestException:
+            return 'error', None
+        # Query counts are only known for requests the server profiled,
+        # see PROFILING_SAMPLE_RATE.
+        found = SERVER_TIMING_QUERIES.search(
+            response.headers.get('Server-Timing', ''))
+        return response.status_code, int(found[1]) if found else None
+
+
+def label_for(method, path):
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return f'{method} {path}'
+    return resolved_action(match, method)
+
+
+def read_log(path):
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                if 'method' in entry and 'path' in entry:
+                    yield entry
+
+
+def summarize(samples, duration):
+    timings = [elapsed * 1000 for _, elapsed, _ in samples]
+    queries = [count for _, _, count in samples if count is not None]
+    summary = {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / duration, 1),
+        'statuses': dict(Counter(str(status) for status, _, _ in samples)),
+        'errors': sum(status == 'error' or status >= 500
+                      for status, _, _ in samples),
+        'max_ms': round(max(timings), 2),
+        **{f'p{share * 100:g}_ms': round(percentile(timings, share), 2)
+           for share in PERCENTILES},
+    }
+    if queries:
+        summary['queries_avg'] = round(sum(queries) / len(queries), 1)
+        summary['queries_max'] = max(queries)
+    return summary
+
+
+class Command(BaseCommand):
+    help = ('Проигрывает журнал запросов к API в процессе или против '
+            'запущенного сервера и пишет отчёт о пропускной способности')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'log',
+            help='JSONL, по строке на запрос: method, path, user, body, name',
+        )
+        parser.add_argument(
+            '--url',
+            help='Адрес сервера, например http://127.0.0.1:8000; без него '
+                 'запросы идут через тестовый клиент в засеянную тестовую '
+                 'базу',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30,
+            help='Таймаут запроса к серверу в секундах',
+        )
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=1,
+            help='Сколько проходов по журналу сделать до замера',
+        )
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument(
+            '--seed',
+            action='store_true',
+            help='С --url засеять базу сервера, если в ней нет рецептов',
+        )
+        parser.add_argument('--label', help='Метка прогона для отчёта')
+        parser.add_argument(
+            '--report',
+            default='replay-report.json',
+            help='Куда записать отчёт в JSON, «-» — в stdout',
+        )
+
+    def handle(self, *args, **options):
+        entries = list(read_log(options['log']))
+        if not entries:
+            raise CommandError('В журнале нет запросов с method и path')
+        if options['url']:
+            if options['seed'] and not Recipe.objects.exists():
+                seed(recipes=options['recipes'], users=options['users'])
+            report = self.run(entries, options)
+        else:
+            with scratch_database():
+                seed(recipes=options['recipes'], users=options['users'])
+                report = self.run(entries, options)
+        self.write_report(report, options['report'])
+
+    def prepare(self, entries):
+        user_numbers = {entry['user'] for entry in entries
+                        if entry.get('user') is not None}
+        users = list(User.objects.order_by('id')[:max(user_numbers,
+                                                      default=-1) + 1])
+        ids = {
+            # Recipes none of the replayed users has saved, so a POST to
+            # favorite or shopping_cart adds a new entry.
+            'recipe': list(Recipe.objects.exclude(
+                infavorite__user__in=users).exclude(
+                carts__user__in=users).values_list('id', flat=True)),
+            'ingredient': list(Ingredient.objects.values_list(
+                'id', flat=True)),
+            'tag': list(Tag.objects.values_list('slug', flat=True)),
+            'author': list(Recipe.objects.values_list(
+                'author', flat=True).distinct()),
+        }
+        if not ids['recipe']:
+            raise CommandError('База пуста, засейте её или добавьте --seed')
+        tokens = [Token.objects.get_or_create(user=user)[0].key
+                  for user in users]
+        return ids, tokens
+
+    def expand(self, entries, ids, tokens, rng):
+        """Requests of one pass over the log. Placeholders are drawn anew
+        on every pass, a DELETE follows the latest POST with the same user
+        and template to the same path, so a POST/DELETE pair leaves the
+        database as it was."""
+        replays = []
+        posted = {}
+        for entry in entries:
+            method = entry['method'].upper()
+            user = entry.get('user')
+            key = (user, entry['path'])
+            after = posted.pop(key) if method == 'DELETE' else None
+            if after:
+                path = after.path
+            else:
+                path = entry['path'].format_map({
+                    name: rng.choice(values) for name, values in ids.items()
+                })
+            replay = Replay(
+                entry.get('name') or label_for(method, path),
+                method, path,
+                user % len(tokens) if user is not None else None,
+                entry.get('body'),
+                after,
+            )
+            if method == 'POST':
+                posted[key] = replay
+            replays.append(replay)
+        return replays
+
+    def run(self, entries, options):
+        ids, tokens = self.prepare(entries)
+        # The same log always expands to the same requests.
+        rng = random.Random(0)
+
+        def passes(count):
+            return [replay for _ in range(count)
+                    for replay in self.expand(entries, ids, tokens, rng)]
+
+        target = (HttpTarget(tokens, options['url'], options['timeout'])
+                  if options['url'] else InProcessTarget(tokens))
+        # Warm-up passes fill in-process indexes and caches and are not
+        # measured.
+        self.replay(target, passes(options['warmup']), 1)
+        samples, duration = self.replay(
+            target, passes(options['repeat']), options['concurrency'])
+        by_label = defaultdict(list)
+        for label, *sample in samples:
+            by_label[label].append(sample)
+        return {
+            'label': options['label'],
+            'target': options['url'] or 'in-process',
+            'database': connection.vendor,
+            'concurrency': options['concurrency'],
+            'repeat': options['repeat'],
+            'duration_s': round(duration, 2),
+            'total': summarize([sample for _, *sample in samples],
+                               duration),
+            'endpoints': {label: summarize(by_label[label], duration)
+                          for label in sorted(by_label)},
+        }
+
+    def replay(self, target, replays, concurrency):
+        pending = iter(replays)
+        lock = threading.Lock()
+        samples = []
+
+        def work():
+            target.start()
+            try:
+                while True:
+                    with lock:
+                        replay = next(pending, None)
+                    if replay is None:
+                        return
+                    if replay.after:
+                        replay.after.done.wait()
+                    started = perf_counter()
+                    try:
+                        status, queries = target.send(replay)
+                    finally:
+                        replay.done.set()
+                    samples.append((replay.label, status,
+                                    perf_counter() - started, queries))
+            finally:
+                target.stop()
+
+        started = perf_counter()
+        workers = [threading.Thread(target=work) for _ in range(concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return samples, perf_counter() - started
+
+    def write_report(self, report, path):
+        content = json.dumps(report, ensure_ascii=False, indent=2,
+                             sort_keys=True)
+        if path == '-':
+            self.stdout.write(content)
+        else:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(content + '\n')
+        for label, result in report['endpoints'].items():
+            self.stdout.write(
+                f'{label}: {result["requests"]} запросов, '
+                f'ошибок {result["errors"]}, p50 {result["p50_ms"]} мс, '
+                f'p95 {result["p95_ms"]} мс, '
+                f'запросов к базе {result.get("queries_avg", "—")}'
+            )
+        total = report['total']
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего {total["requests"]} за {report["duration_s"]} с, '
+            f'{total["throughput_rps"]} rps, p95 {total["p95_ms"]} мс, '
+            f'ошибок {total["errors"]}'
+        ))
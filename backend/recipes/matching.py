@@ -0,0 +1,158 @@
+from array import array
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.core.cache import cache
+from django.db import transaction
+
+from foodgram_backend.routers import reading_from_primary
+
+from .indexes import VersionedIndex
+from .models import RecipeIngredient
+from .versions import bump_version
+
+MATCH_INDEX = 'recipe_ingredients'
+CHANGES_KEY = 'recipe_ingredients:changes'
+CHANGE_TIMEOUT = 60 * 60
+# Beyond this many changes a full rebuild is cheaper than catching up.
+MAX_CHANGES = 500
+CHUNK_SIZE = 5000
+
+
+def change_key(number):
+    return f'{CHANGES_KEY}:{number}'
+
+
+def last_change():
+    return cache.get(CHANGES_KEY, 0)
+
+
+def record_change(recipe_id):
+    cache.add(CHANGES_KEY, 0, None)
+    try:
+        number = cache.incr(CHANGES_KEY)
+    except ValueError:
+        # The cache was cleared in between, so is the version and every
+        # process rebuilds in full.
+        return
+    cache.set(change_key(number), recipe_id, CHANGE_TIMEOUT)
+
+
+class RecipeMatcher(VersionedIndex):
+    # Inverted index from ingredient to the recipes that use it. Recipes
+    # are numbered densely, so postings and recipe sizes are kept in typed
+    # arrays and counting is done by Counter in C.
+    #
+    # A version bump rebuilds the index, a changed recipe is applied from
+    # the change log in the cache: it gets a new position appended to
+    # recipe_ids and sizes, and only the postings of its old and new
+    # ingredients are replaced. Entries at existing positions never
+    # change, so a snapshot stays consistent while the arrays grow.
+
+    version_name = MATCH_INDEX
+
+    def __init__(self):
+        super().__init__()
+        self._applied = 0
+        self._recipes = {}
+
+    def build(self):
+        self._applied = last_change()
+        recipes = {}
+        recipe_ids = array('q')
+        sizes = array('L')
+        postings = {}
+        rows = RecipeIngredient.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=CHUNK_SIZE):
+            if recipe_id not in recipes:
+                recipes[recipe_id] = (len(recipe_ids), [])
+                recipe_ids.append(recipe_id)
+                sizes.append(0)
+            position, ingredient_ids = recipes[recipe_id]
+            ingredient_ids.append(ingredient_id)
+            sizes[position] += 1
+            postings.setdefault(ingredient_id, array('L')).append(position)
+        self._recipes = recipes
+        return recipe_ids, sizes, postings
+
+    def get_data(self):
+        data = super().get_data()
+        last = last_change()
+        if last != self._applied:
+            with self._lock:
+                if last != self._applied:
+                    with reading_from_primary():
+                        self._data = self.apply_changes(last)
+            data = self._data
+        return data
+
+    def apply_changes(self, last):
+        numbers = range(self._applied + 1, last + 1)
+        recipe_ids = self._data[0]
+        # Replaced positions stay in the arrays until the next rebuild.
+        stale = len(recipe_ids) - len(self._recipes)
+        if (not numbers or len(numbers) > MAX_CHANGES
+                or stale > max(len(self._recipes), MAX_CHANGES)):
+            return self.build()
+        changes = cache.get_many([change_key(number) for number in numbers])
+        if len(changes) < len(numbers):
+            return self.build()
+        changed = set(changes.values())
+        contents = defaultdict(list)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=changed
+        ).values_list('recipe_id', 'ingredient_id'):
+            contents[recipe_id].append(ingredient_id)
+        recipe_ids, sizes, postings = self._data
+        removed = defaultdict(set)
+        for recipe_id in changed:
+            position, ingredient_ids = self._recipes.pop(recipe_id, (0, ()))
+            for ingredient_id in ingredient_ids:
+                removed[ingredient_id].add(position)
+        added = defaultdict(list)
+        for recipe_id, ingredient_ids in contents.items():
+            position = len(recipe_ids)
+            recipe_ids.append(recipe_id)
+            sizes.append(len(ingredient_ids))
+            self._recipes[recipe_id] = (position, ingredient_ids)
+            for ingredient_id in ingredient_ids:
+                added[ingredient_id].append(position)
+        # New arrays in a new dict, a snapshot may be reading the old ones.
+        postings = dict(postings)
+        for ingredient_id in removed.keys() | added.keys():
+            positions = removed.get(ingredient_id, ())
+            postings[ingredient_id] = array('L', chain(
+                (position for position in postings.get(ingredient_id, ())
+                 if position not in positions),
+                added.get(ingredient_id, ()),
+            ))
+        self._applied = last
+        return recipe_ids, sizes, postings
+
+    def match(self, ingredient_ids, max_missing=None):
+        recipe_ids, sizes, postings = self.get_data()
+        hits = Counter(chain.from_iterable(
+            postings.get(ingredient_id, ())
+            for ingredient_id in set(ingredient_ids)
+        ))
+        matches = []
+        for position, found in hits.items():
+            missing = sizes[position] - found
+            if max_missing is None or missing <= max_missing:
+                matches.append((recipe_ids[position],
+                                found / sizes[position], missing))
+        matches.sort(key=lambda match: (-match[1], match[2], -match[0]))
+        return matches
+
+
+recipe_matcher = RecipeMatcher()
+
+
+def invalidate_matches():
+    transaction.on_commit(lambda: bump_version(MATCH_INDEX))
+
+
+def update_matches(recipe_id):
+    transaction.on_commit(lambda: record_change(recipe_id))
@@ -0,0 +1,51 @@
+# Generated by Django 3.2 on 2026-10-18 16:53
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def actual_count(related, field):
+    return Coalesce(Subquery(
+        related.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    Recipe.objects.update(
+        favorites_count=actual_count(
+            apps.get_model('recipes', 'Favorite'), 'recipe'),
+        in_carts_count=actual_count(
+            apps.get_model('recipes', 'ShoppingCart'), 'recipe'),
+    )
+    User.objects.update(
+        recipes_count=actual_count(Recipe, 'author'),
+        followers_count=actual_count(
+            apps.get_model('users', 'Subscribe'), 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_created_id_idx'),
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
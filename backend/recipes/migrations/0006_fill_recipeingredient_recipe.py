@@ -0,0 +1,96 @@
+from django.db import migrations, transaction
+from django.db.models import Count, Min, Sum
+
+BATCH_SIZE = 2000
+MAX_AMOUNT = 32000
+
+
+def batches(queryset, batch_size=BATCH_SIZE):
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id')[
+            :batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def copy_recipe_to_ingredients(apps, schema_editor):
+    # Runs outside of a single transaction, one short transaction per batch,
+    # so a large production table is not locked for the whole migration.
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    RecipeIngredientRecipe = apps.get_model(
+        'recipes', 'RecipeIngredientRecipe')
+
+    for links in batches(RecipeIngredientRecipe.objects.all()):
+        with transaction.atomic():
+            recipe_ingredients = RecipeIngredient.objects.in_bulk(
+                [link.recipe_ingredient_id for link in links])
+            updated = {}
+            copies = []
+            for link in links:
+                recipe_ingredient = recipe_ingredients[
+                    link.recipe_ingredient_id]
+                if recipe_ingredient.recipe_id is None:
+                    recipe_ingredient.recipe_id = link.recipe_id
+                    updated[recipe_ingredient.id] = recipe_ingredient
+                elif recipe_ingredient.recipe_id != link.recipe_id:
+                    copies.append(RecipeIngredient(
+                        recipe_id=link.recipe_id,
+                        ingredient_id=recipe_ingredient.ingredient_id,
+                        amount=recipe_ingredient.amount,
+                    ))
+            RecipeIngredient.objects.bulk_update(updated.values(), ['recipe'])
+            RecipeIngredient.objects.bulk_create(copies)
+
+    duplicates = (
+        RecipeIngredient.objects.filter(recipe__isnull=False)
+        .values('recipe', 'ingredient').order_by()
+        .annotate(rows=Count('id'), keep=Min('id'), total=Sum('amount'))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        with transaction.atomic():
+            RecipeIngredient.objects.filter(id=duplicate['keep']).update(
+                amount=min(duplicate['total'], MAX_AMOUNT))
+            RecipeIngredient.objects.filter(
+                recipe=duplicate['recipe'],
+                ingredient=duplicate['ingredient'],
+            ).exclude(id=duplicate['keep']).delete()
+
+    for orphans in batches(RecipeIngredient.objects.filter(
+            recipe__isnull=True)):
+        RecipeIngredient.objects.filter(
+            id__in=[orphan.id for orphan in orphans]).delete()
+
+
+def copy_ingredients_to_links(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    RecipeIngredientRecipe = apps.get_model(
+        'recipes', 'RecipeIngredientRecipe')
+
+    for recipe_ingredients in batches(RecipeIngredient.objects.all()):
+        with transaction.atomic():
+            RecipeIngredientRecipe.objects.bulk_create(
+                RecipeIngredientRecipe(
+                    recipe_ingredient_id=recipe_ingredient.id,
+                    recipe_id=recipe_ingredient.recipe_id,
+                )
+                for recipe_ingredient in recipe_ingredients
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0005_recipeingredient_recipe'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            copy_recipe_to_ingredients, copy_ingredients_to_links
+        ),
+    ]
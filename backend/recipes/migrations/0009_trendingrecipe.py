@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-18 17:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+from datetime import datetime, timezone
+
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def decayed_weight(weight, created):
+    # The formula as of this migration, 0013 moves scores to log space.
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return weight * 2 ** ((created - EPOCH).total_seconds() / half_life)
+
+
+def fill_trending(apps, schema_editor):
+    TrendingRecipe = apps.get_model('recipes', 'TrendingRecipe')
+    scores = defaultdict(float)
+    for model_name, weight in (('Favorite', 1.0), ('ShoppingCart', 2.0)):
+        model = apps.get_model('recipes', model_name)
+        rows = model.objects.order_by().values_list('recipe_id', 'created')
+        for recipe_id, created in rows.iterator(chunk_size=2000):
+            scores[recipe_id] += decayed_weight(weight, created)
+    TrendingRecipe.objects.bulk_create(
+        (TrendingRecipe(recipe_id=recipe_id, score=score)
+         for recipe_id, score in scores.items()),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingRecipe',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('score', models.FloatField(default=0, verbose_name='Рейтинг')),
+            ],
+            options={
+                'ordering': ['-score'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingrecipe',
+            index=models.Index(fields=['-score', '-recipe'], name='trending_score_idx'),
+        ),
+        migrations.RunPython(fill_trending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+from foodgram_backend.operations import AddIndexConcurrently
+
+
+def create_name_prefix_index(apps, schema_editor):
+    # Matches the UPPER(name) LIKE UPPER('...%') that istartswith builds.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+        'recipes_ingredient_name_upper_like '
+        'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)'
+    )
+
+
+def drop_name_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX CONCURRENTLY IF EXISTS recipes_ingredient_name_upper_like'
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0010_recipe_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-created'], name='favorite_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created'], name='recipe_author_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='shoppingcart',
+            index=models.Index(fields=['user', '-created'], name='cart_user_created_idx'),
+        ),
+        migrations.RunPython(create_name_prefix_index,
+                             drop_name_prefix_index),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.2 on 2026-10-18 17:14
+
+from django.db import migrations, models, transaction
+from django.db.models import Count, Min
+
+MAX_AMOUNT = 32000
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    # Recipes using a duplicate are moved to the kept row, amounts of the
+    # same recipe are summed like in 0006. Every group is its own short
+    # transaction: deleting rows referenced by deferred foreign keys and
+    # then altering the table in one transaction fails on PostgreSQL.
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = (
+        Ingredient.objects.values('name', 'measurement_unit').order_by()
+        .annotate(rows=Count('id'), keep=Min('id')).filter(rows__gt=1)
+    )
+    for duplicate in list(duplicates):
+        with transaction.atomic():
+            extra = Ingredient.objects.filter(
+                name=duplicate['name'],
+                measurement_unit=duplicate['measurement_unit'],
+            ).exclude(id=duplicate['keep'])
+            kept = {
+                item.recipe_id: item
+                for item in RecipeIngredient.objects.filter(
+                    ingredient_id=duplicate['keep'])
+            }
+            for item in RecipeIngredient.objects.filter(ingredient__in=extra):
+                target = kept.get(item.recipe_id)
+                if target is None:
+                    item.ingredient_id = duplicate['keep']
+                    item.save(update_fields=['ingredient'])
+                    kept[item.recipe_id] = item
+                else:
+                    target.amount = min(target.amount + item.amount,
+                                        MAX_AMOUNT)
+                    target.save(update_fields=['amount'])
+                    item.delete()
+            extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0011_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2 on 2026-10-18 18:07
+
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def log_weight(weight, created):
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return math.log2(weight) + (created - EPOCH).total_seconds() / half_life
+
+
+def fill_log_scores(apps, schema_editor):
+    # Scores become log2 of the sum of weights, rows with no interactions
+    # left are dropped.
+    TrendingRecipe = apps.get_model('recipes', 'TrendingRecipe')
+    scores = {}
+    interactions = defaultdict(int)
+    for model_name, weight in (('Favorite', 1.0), ('ShoppingCart', 2.0)):
+        model = apps.get_model('recipes', model_name)
+        rows = model.objects.order_by().values_list('recipe_id', 'created')
+        for recipe_id, created in rows.iterator(chunk_size=2000):
+            score = log_weight(weight, created)
+            if recipe_id in scores:
+                high, low = sorted((scores[recipe_id], score), reverse=True)
+                score = high + math.log2(1 + 2 ** (low - high))
+            scores[recipe_id] = score
+            interactions[recipe_id] += 1
+    TrendingRecipe.objects.all().delete()
+    TrendingRecipe.objects.bulk_create(
+        (TrendingRecipe(recipe_id=recipe_id, score=score,
+                        interactions=interactions[recipe_id])
+         for recipe_id, score in scores.items()),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_ingredient_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trendingrecipe',
+            name='interactions',
+            field=models.PositiveIntegerField(default=0, verbose_name='Взаимодействий'),
+        ),
+        migrations.RunPython(fill_log_scores, migrations.RunPython.noop),
+    ]
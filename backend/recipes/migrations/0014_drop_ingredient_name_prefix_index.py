@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def drop_name_prefix_index(apps, schema_editor):
+    # Ingredient search no longer runs istartswith queries, it is served
+    # by the in-memory index and the trigram index from 0002.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX CONCURRENTLY IF EXISTS recipes_ingredient_name_upper_like'
+    )
+
+
+def create_name_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS '
+        'recipes_ingredient_name_upper_like '
+        'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0013_trending_log_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_name_prefix_index,
+                             create_name_prefix_index),
+    ]
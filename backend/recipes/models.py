@@ -1,7 +1,10 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (MinValueValidator, MaxValueValidator)
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
 
-from users.models import User
+from foodgram_backend.counters import CounterFieldsMixin
+from users.models import Subscribe, User
 
 
 MIN_VALUE = 1
@@ -44,12 +47,24 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name} {self.measurement_unit}'
 
 
 class RecipeIngredient(models.Model):
+    recipe = models.ForeignKey(
+        'Recipe',
+        on_delete=models.CASCADE,
+        related_name='ingredients',
+        verbose_name='Рецепт',
+    )
     ingredient = models.ForeignKey(
         Ingredient,
         on_delete=models.CASCADE,
@@ -66,12 +81,54 @@ class RecipeIngredient(models.Model):
 
     class Meta:
         ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'ingredient'],
+                name='unique_recipe_ingredient'
+            )
+        ]
 
     def __str__(self):
         return (f'{self.ingredient.name}: {self.amount}')
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related('author').defer(
+            'search_vector'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    def short(self):
+        return self.only('id', 'author', 'name', 'image', 'image_renditions',
+                         'cooking_time')
+
+    def latest_per_author(self, limit):
+        return self.filter(pk__in=Subquery(
+            self.model.objects.filter(
+                author=OuterRef('author')
+            ).order_by('-created').values('pk')[:limit]
+        ))
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -87,6 +144,12 @@ class Recipe(models.Model):
         'Изображение',
         upload_to='recipes/images/',
     )
+    image_renditions = models.JSONField(
+        'Варианты изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name='Описание',
     )
@@ -94,11 +157,6 @@ class Recipe(models.Model):
         Tag,
         verbose_name='Теги',
     )
-    ingredients = models.ManyToManyField(
-        RecipeIngredient,
-        verbose_name='Ингредиент с кол.',
-        through='RecipeIngredientRecipe'
-    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления',
         validators=[
@@ -110,42 +168,41 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Создан',
     )
-
-    class Meta:
-        ordering = ['-created']
-
-    def __str__(self):
-        return f'{self.name}'
-
-
-class RecipeIngredientRecipe(models.Model):
-    recipe_ingredient = models.ForeignKey(
-        RecipeIngredient,
-        on_delete=models.CASCADE,
-        related_name='recipeIngredientRecipe',
-        verbose_name='Ингредиент с кол.',
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
     )
-    recipe = models.ForeignKey(
-        Recipe,
-        on_delete=models.CASCADE,
-        related_name='ingredient',
-        verbose_name='Рецепт',
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
     )
 
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'in_carts_count')
+
     class Meta:
-        ordering = ['-id']
-        constraints = [
-            models.UniqueConstraint(
-                fields=['recipe_ingredient', 'recipe'],
-                name='unique_recipe_ingredient'
-            )
+        ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'],
+                name='recipe_created_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-created'],
+                name='recipe_author_created_idx'
+            ),
         ]
 
     def __str__(self):
-        return (f'{self.recipe.name} <- '
-                + f'{self.recipe_ingredient.ingredient.name}: '
-                + f'{self.recipe_ingredient.amount}'
-                )
+        return f'{self.name}'
 
 
 class Favorite(models.Model):
@@ -172,6 +229,12 @@ class Favorite(models.Model):
                 name='unique_favorite_recipe'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created'],
+                name='favorite_user_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} -> {self.recipe.name}'
@@ -201,6 +264,37 @@ class ShoppingCart(models.Model):
                 name='unique_user_cart'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created'],
+                name='cart_user_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} -> {self.recipe.name}'
+
+
+class TrendingRecipe(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Рецепт',
+    )
+    # log2 of the sum of interaction weights, see recipes.trending.
+    score = models.FloatField('Рейтинг', default=0)
+    interactions = models.PositiveIntegerField('Взаимодействий', default=0)
+
+    class Meta:
+        ordering = ['-score']
+        indexes = [
+            models.Index(
+                fields=['-score', '-recipe'],
+                name='trending_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.score}'
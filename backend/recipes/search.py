@@ -0,0 +1,123 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, When
+
+from .indexes import VersionedIndex
+from .models import Recipe, RecipeIngredient
+from .versions import bump_version
+
+SEARCH_INDEX = 'recipe_search'
+TOKEN = re.compile(r'\w+')
+# Same order of importance as the tsvector weights A, B and C.
+NAME_WEIGHT = 3
+INGREDIENT_WEIGHT = 2
+TEXT_WEIGHT = 1
+
+
+def has_full_text_search():
+    return connection.vendor == 'postgresql'
+
+
+def tokenize(text):
+    return TOKEN.findall(text.casefold())
+
+
+def search_vector():
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = Subquery(
+        RecipeIngredient.objects.filter(recipe=OuterRef('pk'))
+        .order_by().values('recipe')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(ingredient_names, weight='B', config=config)
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_search_vectors(recipes):
+    if has_full_text_search():
+        recipes.update(search_vector=search_vector())
+    else:
+        bump_version(SEARCH_INDEX)
+
+
+def schedule_search_update(recipe_id):
+    # Ingredients are written after the recipe row, so the vector is built
+    # once the whole transaction is in.
+    transaction.on_commit(lambda: update_search_vectors(
+        Recipe.objects.filter(pk=recipe_id)))
+
+
+class RecipeSearchIndex(VersionedIndex):
+    # Fallback for databases without full-text search, e.g. SQLite test
+    # runs. Query words match tokens by prefix in place of stemming.
+
+    version_name = SEARCH_INDEX
+
+    def build(self):
+        postings = defaultdict(lambda: defaultdict(int))
+        for pk, name, text in Recipe.objects.values_list('id', 'name',
+                                                         'text'):
+            for token in tokenize(name):
+                postings[token][pk] += NAME_WEIGHT
+            for token in tokenize(text):
+                postings[token][pk] += TEXT_WEIGHT
+        for pk, name in RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient__name'):
+            for token in tokenize(name):
+                postings[token][pk] += INGREDIENT_WEIGHT
+        keys = sorted(postings)
+        return keys, [dict(postings[key]) for key in keys]
+
+    def _match(self, data, token):
+        keys, postings = data
+        matched = defaultdict(int)
+        position = bisect_left(keys, token)
+        while position < len(keys) and keys[position].startswith(token):
+            for pk, weight in postings[position].items():
+                matched[pk] += weight
+            position += 1
+        return matched
+
+    def search(self, query):
+        data = self.get_data()
+        scores = None
+        for token in tokenize(query):
+            matched = self._match(data, token)
+            if scores is not None:
+                matched = {pk: scores[pk] + weight
+                           for pk, weight in matched.items() if pk in scores}
+            scores = matched
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        return sorted(scores, key=lambda pk: (-scores[pk], -pk))
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(recipes, query):
+    if has_full_text_search():
+        query = SearchQuery(query, config=settings.RECIPE_SEARCH_CONFIG)
+        return recipes.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-id')
+    ids = recipe_search_index.search(query)
+    if not ids:
+        return recipes.none()
+    return recipes.filter(id__in=ids).order_by(Case(
+        *(When(id=pk, then=position) for position, pk in enumerate(ids)),
+        output_field=IntegerField(),
+    ))
@@ -0,0 +1,161 @@
+import csv
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from users.models import Subscribe, User
+
+from .loaders import rebuild_derived_data
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, Tag)
+from .trending import rebuild
+
+INGREDIENTS_CSV = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+PASSWORD = 'seed-password'
+IMAGE = 'recipes/images/seed.png'
+TAGS = (
+    ('Завтрак', 'breakfast', '#E26C2D'),
+    ('Обед', 'lunch', '#49B64E'),
+    ('Ужин', 'dinner', '#8775D2'),
+    ('Десерт', 'dessert', '#F2C94C'),
+    ('Выпечка', 'baking', '#D9822B'),
+    ('Постное', 'lenten', '#2D9CDB'),
+)
+BATCH_SIZE = 2000
+
+
+def read_ingredients(path):
+    # Some rows of the catalogue start with an id, name and unit are
+    # always the last two columns.
+    with open(path, encoding='utf-8') as file:
+        rows = {(row[-2].strip(), row[-1].strip())
+                for row in csv.reader(file) if len(row) >= 2}
+    return sorted(rows)
+
+
+@contextmanager
+def scratch_database():
+    """Run the block against a fresh test database, a local cache and a
+    temporary MEDIA_ROOT, all removed afterwards."""
+    media_root = tempfile.mkdtemp()
+    old_name = connection.settings_dict['NAME']
+    # Replicas configured with TEST MIRROR read the same test database.
+    mirrors = {
+        alias: connections[alias].settings_dict['NAME']
+        for alias in connections
+        if connections[alias].settings_dict['TEST']['MIRROR']
+        == connection.alias
+    }
+    setup_test_environment()
+    try:
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        for alias in mirrors:
+            connections[alias].close()
+            connections[alias].creation.set_as_test_mirror(
+                connection.settings_dict)
+        with override_settings(
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }},
+            MEDIA_ROOT=media_root,
+            RECIPE_IMAGE_WORKERS=0,
+        ):
+            yield
+    finally:
+        for alias, name in mirrors.items():
+            connections[alias].close()
+            connections[alias].settings_dict['NAME'] = name
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+def seed(recipes=2000, users=200, subscriptions=10, favorites=20, carts=5,
+         ingredients_csv=INGREDIENTS_CSV, random_seed=0):
+    """Fill an empty database with a reproducible dataset."""
+    rng = random.Random(random_seed)
+    Ingredient.objects.bulk_create(
+        (Ingredient(name=name, measurement_unit=unit)
+         for name, unit in read_ingredients(ingredients_csv)),
+        batch_size=BATCH_SIZE,
+    )
+    ingredients = list(Ingredient.objects.values_list('id', 'name'))
+    Tag.objects.bulk_create(
+        Tag(name=name, slug=slug, color=color) for name, slug, color in TAGS
+    )
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        (User(username=f'user{number}', email=f'user{number}@example.com',
+              first_name='Имя', last_name='Фамилия', password=password)
+         for number in range(users)),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.values_list('id', flat=True))
+
+    contents = [rng.sample(ingredients, rng.randint(3, 12))
+                for _ in range(recipes)]
+    Recipe.objects.bulk_create(
+        (Recipe(
+            author_id=rng.choice(user_ids),
+            name=f'Рецепт {number}',
+            text=' '.join(name for _, name in contents[number]),
+            image=IMAGE,
+            cooking_time=rng.randint(5, 180),
+        ) for number in range(recipes)),
+        batch_size=BATCH_SIZE,
+    )
+    recipe_ids = list(Recipe.objects.order_by('id').values_list(
+        'id', flat=True))
+    RecipeIngredient.objects.bulk_create(
+        (RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                          amount=rng.randint(1, 500))
+         for recipe_id, content in zip(recipe_ids, contents)
+         for ingredient_id, _ in content),
+        batch_size=BATCH_SIZE,
+    )
+    Recipe.tags.through.objects.bulk_create(
+        (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+         for recipe_id in recipe_ids
+         for tag_id in rng.sample(tag_ids, rng.randint(1, 3))),
+        batch_size=BATCH_SIZE,
+    )
+
+    Subscribe.objects.bulk_create(
+        (Subscribe(user_id=user_id, author_id=author_id)
+         for user_id in user_ids
+         for author_id in rng.sample(user_ids,
+                                     min(subscriptions, len(user_ids)))
+         if author_id != user_id),
+        batch_size=BATCH_SIZE,
+    )
+    for model, count in ((Favorite, favorites), (ShoppingCart, carts)):
+        model.objects.bulk_create(
+            (model(user_id=user_id, recipe_id=recipe_id)
+             for user_id in user_ids
+             for recipe_id in rng.sample(recipe_ids,
+                                         min(count, len(recipe_ids)))),
+            batch_size=BATCH_SIZE,
+        )
+
+    rebuild()
+    rebuild_derived_data(Recipe.objects.all(), User.objects.all())
+    return {
+        'ingredients': len(ingredients),
+        'tags': len(tag_ids),
+        'users': len(user_ids),
+        'recipes': len(recipe_ids),
+        'recipe_ingredients': RecipeIngredient.objects.count(),
+        'subscriptions': Subscribe.objects.count(),
+        'favorites': Favorite.objects.count(),
+        'carts': ShoppingCart.objects.count(),
+    }
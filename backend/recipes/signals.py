@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from import_export.signals import post_import
+
+from users.models import User
+
+from .images import schedule_renditions
+from .matching import invalidate_matches, update_matches
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .search import schedule_search_update, update_search_vectors
+from .trending import add_score, get_weight, remove_score
+from .versions import bump_version
+
+
+REFERENCE_MODELS = (Ingredient, Tag)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_reference_version(sender, **kwargs):
+    # A request served before the commit would cache the old rows under
+    # the new version.
+    name = sender._meta.model_name
+    transaction.on_commit(lambda: bump_version(name))
+
+
+@receiver(post_import)
+def bump_version_after_import(sender, model, **kwargs):
+    if model in REFERENCE_MODELS:
+        name = model._meta.model_name
+        transaction.on_commit(lambda: bump_version(name))
+
+
+COUNTERS = (
+    (Favorite, Recipe, 'recipe_id', 'favorites_count'),
+    (ShoppingCart, Recipe, 'recipe_id', 'in_carts_count'),
+    (Recipe, User, 'author_id', 'recipes_count'),
+)
+
+
+def update_counter(instance, delta):
+    for model, target, field, counter in COUNTERS:
+        if isinstance(instance, model):
+            targets = target.objects.filter(pk=getattr(instance, field))
+            if delta < 0:
+                targets = targets.filter(**{f'{counter}__gt': 0})
+            targets.update(**{counter: F(counter) + delta})
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        update_counter(instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipe)
+def decrement_counter(sender, instance, **kwargs):
+    update_counter(instance, -1)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def add_trending_score(sender, instance, created, **kwargs):
+    if created:
+        add_score(instance.recipe_id, get_weight(instance))
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def remove_trending_score(sender, instance, **kwargs):
+    remove_score(instance.recipe_id, get_weight(instance))
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_image_renditions(sender, instance, **kwargs):
+    source = instance.image_renditions.get('source')
+    if instance.image and source != instance.image.name:
+        schedule_renditions(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def refresh_search_vector(sender, instance, **kwargs):
+    schedule_search_update(instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: update_search_vectors(
+            Recipe.objects.filter(ingredients__ingredient=instance)))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def refresh_recipe_matches(sender, instance, **kwargs):
+    update_matches(instance.pk)
+
+
+@receiver(post_delete, sender=Ingredient)
+def rebuild_recipe_matches(sender, **kwargs):
+    invalidate_matches()
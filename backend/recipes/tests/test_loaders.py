@@ -0,0 +1,125 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Ingredient, Recipe
+
+
+def load(tmp_path, model, items):
+    path = tmp_path / 'items.jsonl'
+    path.write_text('\n'.join(json.dumps(item, ensure_ascii=False)
+                              for item in items), encoding='utf-8')
+    out = StringIO()
+    call_command('load_data', str(path), model=model, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+def test_malformed_ingredients_are_skipped(tmp_path):
+    out = load(tmp_path, 'ingredients', [
+        {'name': 'Соль', 'measurement_unit': 'г'},
+        {'measurement_unit': 'г'},
+        {'name': 'Перец'},
+        {'name': ' ', 'measurement_unit': 'г'},
+        {'name': None, 'measurement_unit': 'г'},
+        'Сахар',
+        ['Мука', 'г'],
+        None,
+    ])
+    assert list(Ingredient.objects.values_list(
+        'name', 'measurement_unit')) == [('Соль', 'г')]
+    assert 'пропущено 7' in out
+
+
+@pytest.mark.django_db
+def test_malformed_recipes_are_skipped(tmp_path, user, tags, ingredients):
+    recipe = {
+        'author': user.email, 'name': 'Суп', 'text': 'Текст',
+        'image': 'recipes/images/test.png', 'cooking_time': 10,
+        'tags': [tags[0].slug],
+        'ingredients': [{'name': ingredients[0].name,
+                         'measurement_unit': 'г', 'amount': 100}],
+    }
+    out = load(tmp_path, 'recipes', [
+        recipe,
+        {**recipe, 'name': 'Каша', 'ingredients': [{'amount': 100}]},
+        {**recipe, 'name': 'Борщ', 'ingredients': ['Свёкла']},
+        {**recipe, 'name': ['Щи']},
+        {'name': 'Пирог'},
+        'Компот',
+        None,
+    ])
+    assert list(Recipe.objects.values_list('name', flat=True)) == ['Суп']
+    assert 'пропущено 6' in out
+
+
+@pytest.mark.django_db
+def test_ingredients_load_in_chunks(tmp_path):
+    path = tmp_path / 'items.jsonl'
+    path.write_text('\n'.join(
+        json.dumps({'name': name, 'measurement_unit': 'г'},
+                   ensure_ascii=False)
+        for name in ('Соль', 'Перец', 'Соль', 'Сахар', 'х' * 151)
+    ), encoding='utf-8')
+    out = StringIO()
+    call_command('load_data', str(path), chunk_size=1, stdout=out)
+    assert set(Ingredient.objects.values_list('name', flat=True)) == {
+        'Соль', 'Перец', 'Сахар'}
+    assert 'добавлено 3, пропущено 1' in out.getvalue()
+
+
+def recipe_item(author, ingredient, **fields):
+    return {
+        'author': author.email, 'name': 'Суп', 'text': 'Текст',
+        'image': 'recipes/images/test.png', 'cooking_time': 10,
+        'tags': [],
+        'ingredients': [{'name': ingredient.name,
+                         'measurement_unit': ingredient.measurement_unit,
+                         'amount': 100}],
+        **fields,
+    }
+
+
+@pytest.mark.django_db
+def test_negative_amount_is_skipped(tmp_path, user, ingredients):
+    item = recipe_item(user, ingredients[0])
+    item['ingredients'][0]['amount'] = -5
+    out = load(tmp_path, 'recipes', [item])
+    assert not Recipe.objects.exists()
+    assert 'добавлено 0, пропущено 1' in out
+
+
+@pytest.mark.django_db
+def test_out_of_range_values_are_skipped(tmp_path, user, ingredients):
+    zero_amount = recipe_item(user, ingredients[0], name='Каша')
+    zero_amount['ingredients'][0]['amount'] = 0
+    out = load(tmp_path, 'recipes', [
+        zero_amount,
+        recipe_item(user, ingredients[0], name='Щи', cooking_time=0),
+        recipe_item(user, ingredients[0], name='Плов', cooking_time=40000),
+        recipe_item(user, ingredients[0], name='Б' * 51),
+        recipe_item(user, ingredients[0], name='Борщ'),
+    ])
+    assert list(Recipe.objects.values_list('name', flat=True)) == ['Борщ']
+    assert 'добавлено 1, пропущено 4' in out
+
+
+@pytest.mark.django_db
+def test_taken_and_repeated_names_are_counted(
+        tmp_path, user, make_user, make_recipes, ingredients):
+    other = make_user()
+    taken, = make_recipes(other, 1)
+    out = load(tmp_path, 'recipes', [
+        recipe_item(user, ingredients[0], name=taken.name),
+        recipe_item(user, ingredients[0], name='Суп'),
+        recipe_item(other, ingredients[0], name='Суп'),
+        recipe_item(user, ingredients[0], name='Суп'),
+    ])
+    assert list(Recipe.objects.filter(author=user).values_list(
+        'name', flat=True)) == ['Суп']
+    assert 'добавлено 1, пропущено 3' in out
+    user.refresh_from_db()
+    other.refresh_from_db()
+    assert (user.recipes_count, other.recipes_count) == (1, 1)
@@ -0,0 +1,22 @@
+import random
+
+from recipes.management.commands.replay_requests import Command
+
+LOG = [
+    {'method': 'POST', 'path': '/api/recipes/{recipe}/favorite/', 'user': 0},
+    {'method': 'GET', 'path': '/api/recipes/{recipe}/', 'user': 0},
+    {'method': 'DELETE', 'path': '/api/recipes/{recipe}/favorite/',
+     'user': 0},
+]
+
+
+def test_delete_follows_its_post_and_passes_differ(db):
+    ids = {'recipe': list(range(1000))}
+    rng = random.Random(0)
+    first, second = (Command().expand(LOG, ids, ['token'], rng)
+                     for _ in range(2))
+    for post, _, delete in (first, second):
+        assert delete.path == post.path
+        assert delete.after is post
+        assert post.after is None
+    assert first[0].path != second[0].path
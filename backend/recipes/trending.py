@@ -0,0 +1,103 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Greatest, Log, Power
+
+from .models import Favorite, ShoppingCart, TrendingRecipe
+
+# Weights grow as 2 ** (age of EPOCH / half-life) instead of decaying, so
+# rows never have to be rewritten as time passes: the order by stored
+# score is the order by decayed score at any moment. Scores are stored as
+# log2 of the sum of weights, which stays a small number however far
+# EPOCH falls behind. Changing the half-life requires refresh_trending.
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+WEIGHTS = (
+    (Favorite, 1.0),
+    (ShoppingCart, 2.0),
+)
+CHUNK_SIZE = 2000
+# Removing the interaction that makes up almost the whole score leaves at
+# least this share of it, log2(1 - x) is undefined for x >= 1.
+MIN_REMAINDER = 2 ** -40
+
+
+def log_weight(weight, created):
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return math.log2(weight) + (created - EPOCH).total_seconds() / half_life
+
+
+def log_add(score, weight):
+    high, low = max(score, weight), min(score, weight)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def get_weight(instance):
+    for model, weight in WEIGHTS:
+        if isinstance(instance, model):
+            return log_weight(weight, instance.created)
+    return None
+
+
+def added_score(weight):
+    weight = Value(weight, output_field=FloatField())
+    return Greatest(F('score'), weight) + Log(
+        2, 1 + Power(2, -Abs(F('score') - weight)))
+
+
+def removed_score(weight):
+    weight = Value(weight, output_field=FloatField())
+    return F('score') + Log(2, Greatest(
+        1 - Power(2, weight - F('score')),
+        Value(MIN_REMAINDER, output_field=FloatField())))
+
+
+def add_score(recipe_id, weight):
+    _, created = TrendingRecipe.objects.get_or_create(
+        recipe_id=recipe_id, defaults={'score': weight, 'interactions': 1})
+    if not created:
+        TrendingRecipe.objects.filter(recipe_id=recipe_id).update(
+            score=added_score(weight),
+            interactions=F('interactions') + 1)
+
+
+def remove_score(recipe_id, weight):
+    # A recipe leaves the feed with its last interaction, whatever
+    # rounding has left in the score.
+    with transaction.atomic():
+        trending = TrendingRecipe.objects.select_for_update().filter(
+            recipe_id=recipe_id)
+        interactions = trending.values_list(
+            'interactions', flat=True).first()
+        if interactions is None:
+            return
+        if interactions <= 1:
+            trending.delete()
+        else:
+            trending.update(score=removed_score(weight),
+                            interactions=F('interactions') - 1)
+
+
+def rebuild():
+    scores = {}
+    interactions = defaultdict(int)
+    for model, weight in WEIGHTS:
+        rows = model.objects.order_by().values_list('recipe_id', 'created')
+        for recipe_id, created in rows.iterator(chunk_size=CHUNK_SIZE):
+            score = log_weight(weight, created)
+            if recipe_id in scores:
+                score = log_add(scores[recipe_id], score)
+            scores[recipe_id] = score
+            interactions[recipe_id] += 1
+    with transaction.atomic():
+        TrendingRecipe.objects.all().delete()
+        TrendingRecipe.objects.bulk_create(
+            (TrendingRecipe(recipe_id=recipe_id, score=score,
+                            interactions=interactions[recipe_id])
+             for recipe_id, score in scores.items()),
+            batch_size=CHUNK_SIZE,
+        )
+    return len(scores)
@@ -0,0 +1,21 @@
+import uuid
+
+from django.core.cache import cache
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    key = version_key(name)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    cache.set(version_key(name), uuid.uuid4().hex, None)
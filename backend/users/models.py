@@ -1,8 +1,24 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as BaseUserManager
 from django.db import models
+from django.db.models import Exists, OuterRef
 
+from foodgram_backend.counters import CounterFieldsMixin
 
-class User(AbstractUser):
+
+class UserQuerySet(models.QuerySet):
+    def with_is_subscribed(self, user):
+        if not user.is_authenticated:
+            return self
+        return self.annotate(is_subscribed=Exists(Subscribe.objects.filter(
+            user=user, author=OuterRef('pk'))))
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
+class User(CounterFieldsMixin, AbstractUser):
     first_name = models.CharField(
         'First name',
         max_length=150,
@@ -25,6 +41,20 @@ class User(AbstractUser):
         'Password',
         max_length=150,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Recipes count',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Followers count',
+        default=0,
+        editable=False,
+    )
+
+    objects = UserManager()
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         ordering = ['id']